@@ -4,34 +4,48 @@
 """Configuration module for the bot."""
 
 import os
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Base directory of the project
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration class for the bot."""
+    """Configuration class for the bot (read once at import, immutable afterwards)."""
     
     # Telegram API credentials
-    API_ID = int(os.getenv("API_ID", 0))
-    API_HASH = os.getenv("API_HASH", "")
-    BOT_TOKEN = os.getenv("BOT_TOKEN", "")
+    API_ID: int = int(os.getenv("API_ID", 0))
+    API_HASH: str = os.getenv("API_HASH", "")
+    BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
     
     # Admin and access control
-    ADMIN_ID = int(os.getenv("ADMIN_ID", 0))
-    ACCESS_PASSWORD = os.getenv("ACCESS_PASSWORD", "")
+    ADMIN_ID: int = int(os.getenv("ADMIN_ID", 0))
+    ACCESS_PASSWORD: str = os.getenv("ACCESS_PASSWORD", "")
     
     # Access timeout in seconds (1 hour)
-    ACCESS_TIMEOUT = 3600
+    ACCESS_TIMEOUT: int = 3600
+    
+    # Pending conversation states (abandoned ones expire after this many seconds)
+    STATE_TIMEOUT: int = 600
+    STATE_MAX_USERS: int = 10000
+    STATE_EXPIRE_INTERVAL: int = 60  # seconds between background sweeps
     
     # Database
-    DB_PATH = "database/video_archive.db"
+    DB_PATH: str = "database/video_archive.db"
+    DB_POOL_MIN: int = int(os.getenv("DB_POOL_MIN", 2))
+    DB_POOL_MAX: int = int(os.getenv("DB_POOL_MAX", 10))
+    DB_POOL_TIMEOUT: int = 5  # seconds to wait for a free connection
     
     # Directories
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    DATA_DIR = os.path.join(BASE_DIR, "DATA")
-    VIDEO_DIR = os.path.join(DATA_DIR, "videos")
-    THUMBNAIL_DIR = os.path.join(DATA_DIR, "thumbnails")
+    BASE_DIR: str = _BASE_DIR
+    DATA_DIR: str = os.path.join(_BASE_DIR, "DATA")
+    VIDEO_DIR: str = os.path.join(_BASE_DIR, "DATA", "videos")
+    THUMBNAIL_DIR: str = os.path.join(_BASE_DIR, "DATA", "thumbnails")
 
 # Create a config instance
 config = Config()
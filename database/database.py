@@ -4,14 +4,33 @@
 """Database operations module."""
 
 import os
+import queue
+import asyncio
 import sqlite3
 import logging
+import threading
 import time
 from contextlib import contextmanager
 from config import config
 
 logger = logging.getLogger(__name__)
 
+# Number of prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+# Hot queries, kept as module constants so every call hits the statement cache
+SQL_GET_USER = "SELECT access_until FROM users WHERE id = ?"
+SQL_GET_VIDEO = "SELECT * FROM videos WHERE id = ?"
+# Thumbnail paths live on the video row, so one SELECT serves the browse listing
+SQL_GET_VIDEOS_BY_CATEGORY = (
+    "SELECT id, title, type, path_or_url, thumbnail_path "
+    "FROM videos WHERE category_id = ? ORDER BY title"
+)
+SQL_ADD_VIDEO = (
+    "INSERT INTO videos (title, type, path_or_url, category_id, thumbnail_path) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
 def init_db():
     """Initialize the database with required tables if they don't exist."""
     # Create the directory if it doesn't exist
@@ -21,26 +40,32 @@ def init_db():
         with get_connection() as conn:
             cursor = conn.cursor()
             
-            # Create users table for access control
-            cursor.execute('''
+            # Match the OS page size; only takes effect on a fresh database,
+            # so it has to run before WAL is enabled and tables are created
+            cursor.execute("PRAGMA page_size=4096")
+            
+            # Switch to write-ahead logging so readers don't block writers.
+            # The journal mode is persistent, so it only needs to be set once.
+            if config.DB_PATH != ":memory:":
+                cursor.execute("PRAGMA journal_mode=WAL")
+            
+            # Create all tables and indexes in a single script
+            conn.executescript('''
+                -- Users table for access control
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY,
                     username TEXT,
                     access_until INTEGER,
                     UNIQUE(id)
-                )
-            ''')
-            
-            # Create categories table
-            cursor.execute('''
+                );
+                
+                -- Categories table
                 CREATE TABLE IF NOT EXISTS categories (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT NOT NULL UNIQUE
-                )
-            ''')
-            
-            # Create videos table
-            cursor.execute('''
+                );
+                
+                -- Videos table
                 CREATE TABLE IF NOT EXISTS videos (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     title TEXT NOT NULL,
@@ -49,12 +74,16 @@ def init_db():
                     category_id INTEGER,
                     thumbnail_path TEXT,
                     FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE CASCADE
-                )
+                );
+                
+                -- Indexes for category lookups (the composite one also serves ORDER BY title)
+                CREATE INDEX IF NOT EXISTS idx_videos_category ON videos(category_id);
+                CREATE INDEX IF NOT EXISTS idx_videos_category_title ON videos(category_id, title);
+                
+                -- Index for sweeping expired users
+                CREATE INDEX IF NOT EXISTS idx_users_access_until ON users(access_until);
             ''')
             
-            # Enable foreign keys
-            cursor.execute("PRAGMA foreign_keys = ON")
-            
             conn.commit()
             logger.info("Database initialized successfully")
     except sqlite3.Error as e:
@@ -62,29 +91,160 @@ def init_db():
         raise
 
 
+# Cached category rows (invalidated whenever categories change)
+_categories_cache = None
+_categories_by_id = None
+_cache_lock = threading.Lock()
+# Bumped on every invalidation, so a read that raced with a change isn't cached
+_categories_generation = 0
+
+# Known access expiry times (user_id -> access_until)
+_access_cache = {}
+
+# Connection pool state
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _create_connection():
+    """Open and configure a new database connection."""
+    connection = sqlite3.connect(
+        config.DB_PATH,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    connection.row_factory = sqlite3.Row
+    
+    # Foreign keys are enforced per connection, so cascades need this on every one
+    connection.execute("PRAGMA foreign_keys = ON")
+    
+    # Per-connection tuning (safe with WAL, keeps temp data in memory)
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=5000")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    connection.execute("PRAGMA cache_size=-20000")
+    
+    # Read pages through a memory map instead of read() syscalls (256 MB cap)
+    connection.execute("PRAGMA mmap_size=268435456")
+    return connection
+
+
+def _acquire_connection():
+    """Take a connection from the pool, growing it up to the configured maximum."""
+    global _pool, _pool_size
+    
+    with _pool_lock:
+        if _pool is None:
+            _pool = queue.LifoQueue(maxsize=config.DB_POOL_MAX)
+            for _ in range(config.DB_POOL_MIN):
+                _pool.put(_create_connection())
+                _pool_size += 1
+        pool = _pool
+    
+    try:
+        connection = pool.get_nowait()
+    except queue.Empty:
+        with _pool_lock:
+            can_grow = _pool_size < config.DB_POOL_MAX
+            if can_grow:
+                _pool_size += 1
+        if can_grow:
+            try:
+                return _create_connection()
+            except sqlite3.Error:
+                with _pool_lock:
+                    _pool_size -= 1
+                raise
+        try:
+            connection = pool.get(timeout=config.DB_POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+    
+    # Validate the connection and replace it if it went bad
+    try:
+        connection.execute("SELECT 1")
+    except sqlite3.Error:
+        logger.warning("Dropping broken pooled database connection")
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+        connection = _create_connection()
+    
+    return connection
+
+
+def _release_connection(connection):
+    """Return a connection to the pool, closing it if the pool was shut down."""
+    global _pool_size
+    
+    try:
+        # Never hand out a connection with a half-finished transaction
+        if connection.in_transaction:
+            connection.rollback()
+    except sqlite3.Error:
+        connection.close()
+        with _pool_lock:
+            _pool_size -= 1
+        return
+    
+    with _pool_lock:
+        pool = _pool
+    
+    if pool is None:
+        connection.close()
+        return
+    
+    try:
+        pool.put_nowait(connection)
+    except queue.Full:
+        connection.close()
+        with _pool_lock:
+            _pool_size -= 1
+
+
+def close_pool():
+    """Close all pooled database connections."""
+    global _pool, _pool_size
+    
+    with _pool_lock:
+        pool, _pool = _pool, None
+        _pool_size = 0
+    
+    if pool is None:
+        return
+    
+    while True:
+        try:
+            pool.get_nowait().close()
+        except queue.Empty:
+            break
+    logger.info("Database connection pool closed")
+
+
 @contextmanager
 def get_connection():
-    """Context manager for database connections."""
+    """Context manager for pooled database connections."""
     connection = None
     try:
-        connection = sqlite3.connect(config.DB_PATH)
-        connection.row_factory = sqlite3.Row
+        connection = _acquire_connection()
         yield connection
     except sqlite3.Error as e:
         logger.error(f"Database error: {e}")
         raise
     finally:
         if connection:
-            connection.close()
+            _release_connection(connection)
 
 
 # User operations
 def get_user(user_id):
-    """Get user from database by ID."""
+    """Get a user's access record (access_until only) by ID."""
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+            cursor.execute(SQL_GET_USER, (user_id,))
             return cursor.fetchone()
     except sqlite3.Error as e:
         logger.error(f"Error getting user: {e}")
@@ -98,11 +258,15 @@ def save_user_access(user_id, username, expires_in=config.ACCESS_TIMEOUT):
             cursor = conn.cursor()
             access_until = int(time.time()) + expires_in
             cursor.execute(
-                """INSERT OR REPLACE INTO users (id, username, access_until) 
-                   VALUES (?, ?, ?)""",
+                """INSERT INTO users (id, username, access_until)
+                   VALUES (?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET
+                       username = excluded.username,
+                       access_until = excluded.access_until""",
                 (user_id, username, access_until)
             )
             conn.commit()
+            _access_cache[user_id] = access_until
             return True
     except sqlite3.Error as e:
         logger.error(f"Error saving user access: {e}")
@@ -111,25 +275,119 @@ def save_user_access(user_id, username, expires_in=config.ACCESS_TIMEOUT):
 
 def check_user_access(user_id):
     """Check if user has valid access."""
+    # Admin access is permanent and comes from the config
+    if user_id == config.ADMIN_ID:
+        return True
+    
+    current_time = int(time.time())
+    
+    # Serve still-valid grants from memory without touching the database
+    if _access_cache.get(user_id, 0) > current_time:
+        return True
+    
     user = get_user(user_id)
     if not user:
         return False
     
-    current_time = int(time.time())
+    _access_cache[user_id] = user["access_until"]
     return user["access_until"] > current_time
 
 
 # Category operations
+def _invalidate_categories_cache():
+    """Drop the cached category list so the next read hits the database."""
+    global _categories_cache, _categories_by_id, _categories_generation
+    with _cache_lock:
+        _categories_cache = None
+        _categories_by_id = None
+        _categories_generation += 1
+
+
+def _store_categories(categories, generation):
+    """Cache a category list unless the categories changed since it was read."""
+    global _categories_cache, _categories_by_id
+    with _cache_lock:
+        if generation != _categories_generation:
+            return
+        _categories_cache = categories
+        _categories_by_id = {cat["id"]: cat for cat in categories}
+
+
 def get_all_categories():
-    """Get all categories."""
+    """Get all categories (cached until categories are modified)."""
+    with _cache_lock:
+        if _categories_cache is not None:
+            return list(_categories_cache)
+        generation = _categories_generation
+    
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM categories ORDER BY name")
-            return cursor.fetchall()
+            cursor.execute("SELECT id, name FROM categories ORDER BY name")
+            categories = cursor.fetchall()
     except sqlite3.Error as e:
         logger.error(f"Error getting categories: {e}")
         return []
+    
+    _store_categories(categories, generation)
+    return list(categories)
+
+
+def get_category_by_id(category_id):
+    """Get a single category by ID, served from the category cache."""
+    if _categories_by_id is None:
+        get_all_categories()
+    
+    with _cache_lock:
+        if _categories_by_id is None:
+            return None
+        return _categories_by_id.get(category_id)
+
+
+def get_categories_if_authorized(user_id, now=None):
+    """
+    Get all categories if the user has valid access, in a single round trip.
+    
+    Returns:
+        list: Categories, or None if the user has no valid access
+    """
+    if now is None:
+        now = int(time.time())
+    
+    # Admin or still-cached access: only the category list is needed
+    if user_id == config.ADMIN_ID or _access_cache.get(user_id, 0) > now:
+        return get_all_categories()
+    
+    with _cache_lock:
+        generation = _categories_generation
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            # One row per category (or a single NULL row when there are none),
+            # and no rows at all for unknown users
+            cursor.execute(
+                """SELECT c.id, c.name, u.access_until
+                   FROM users u LEFT JOIN categories c ON 1 = 1
+                   WHERE u.id = ?
+                   ORDER BY c.name""",
+                (user_id,)
+            )
+            rows = cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error getting categories for user: {e}")
+        return None
+    
+    if not rows:
+        return None
+    
+    _access_cache[user_id] = rows[0]["access_until"]
+    if rows[0]["access_until"] <= now:
+        return None
+    
+    # Keep the user's access_until out of the shared cache
+    categories = [{"id": row["id"], "name": row["name"]} for row in rows if row["id"] is not None]
+    _store_categories(categories, generation)
+    return list(categories)
 
 
 def add_category(name):
@@ -139,6 +397,7 @@ def add_category(name):
             cursor = conn.cursor()
             cursor.execute("INSERT INTO categories (name) VALUES (?)", (name,))
             conn.commit()
+            _invalidate_categories_cache()
             return cursor.lastrowid
     except sqlite3.Error as e:
         logger.error(f"Error adding category: {e}")
@@ -151,14 +410,23 @@ def delete_category(category_id):
         with get_connection() as conn:
             cursor = conn.cursor()
             
+            # Take the write lock up front so the read and deletes are one transaction
+            cursor.execute("BEGIN IMMEDIATE")
+            
             # Get all videos in this category to delete files
-            cursor.execute("SELECT * FROM videos WHERE category_id = ?", (category_id,))
+            # Only the columns delete_video_files_async needs
+            cursor.execute(
+                "SELECT id, type, path_or_url, thumbnail_path FROM videos WHERE category_id = ?",
+                (category_id,)
+            )
             videos = cursor.fetchall()
             
-            # Delete the category (cascade will delete videos from the database)
+            # Remove the videos in one statement rather than relying on the cascade
+            cursor.execute("DELETE FROM videos WHERE category_id = ?", (category_id,))
             cursor.execute("DELETE FROM categories WHERE id = ?", (category_id,))
             
             conn.commit()
+            _invalidate_categories_cache()
             return videos  # Return videos for file deletion outside DB transaction
     except sqlite3.Error as e:
         logger.error(f"Error deleting category: {e}")
@@ -172,9 +440,7 @@ def add_video(title, video_type, path_or_url, category_id, thumbnail_path=None):
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                """INSERT INTO videos 
-                   (title, type, path_or_url, category_id, thumbnail_path) 
-                   VALUES (?, ?, ?, ?, ?)""",
+                SQL_ADD_VIDEO,
                 (title, video_type, path_or_url, category_id, thumbnail_path)
             )
             conn.commit()
@@ -189,10 +455,7 @@ def get_videos_by_category(category_id):
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM videos WHERE category_id = ? ORDER BY title", 
-                (category_id,)
-            )
+            cursor.execute(SQL_GET_VIDEOS_BY_CATEGORY, (category_id,))
             return cursor.fetchall()
     except sqlite3.Error as e:
         logger.error(f"Error getting videos by category: {e}")
@@ -204,7 +467,7 @@ def get_video(video_id):
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM videos WHERE id = ?", (video_id,))
+            cursor.execute(SQL_GET_VIDEO, (video_id,))
             return cursor.fetchone()
     except sqlite3.Error as e:
         logger.error(f"Error getting video: {e}")
@@ -216,7 +479,7 @@ def delete_video(video_id):
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM videos WHERE id = ?", (video_id,))
+            cursor.execute(SQL_GET_VIDEO, (video_id,))
             video = cursor.fetchone()
             
             cursor.execute("DELETE FROM videos WHERE id = ?", (video_id,))
@@ -225,4 +488,74 @@ def delete_video(video_id):
             return video  # Return video details for file deletion outside DB transaction
     except sqlite3.Error as e:
         logger.error(f"Error deleting video: {e}")
-        return None 
\ No newline at end of file
+        return None 
+
+
+# Async wrappers (run blocking sqlite3 work off the event loop)
+async def asave_user_access(user_id, username, expires_in=config.ACCESS_TIMEOUT):
+    """Async version of save_user_access."""
+    return await asyncio.to_thread(save_user_access, user_id, username, expires_in)
+
+
+async def acheck_user_access(user_id):
+    """Async version of check_user_access (cache hits skip the thread hop)."""
+    if user_id == config.ADMIN_ID or _access_cache.get(user_id, 0) > int(time.time()):
+        return True
+    return await asyncio.to_thread(check_user_access, user_id)
+
+
+async def aget_all_categories():
+    """Async version of get_all_categories (cache hits skip the thread hop)."""
+    with _cache_lock:
+        if _categories_cache is not None:
+            return list(_categories_cache)
+    return await asyncio.to_thread(get_all_categories)
+
+
+async def aget_category_by_id(category_id):
+    """Async version of get_category_by_id (cache hits skip the thread hop)."""
+    with _cache_lock:
+        if _categories_by_id is not None:
+            return _categories_by_id.get(category_id)
+    return await asyncio.to_thread(get_category_by_id, category_id)
+
+
+async def aget_categories_if_authorized(user_id, now=None):
+    """Async version of get_categories_if_authorized."""
+    if now is None:
+        now = int(time.time())
+    if user_id == config.ADMIN_ID or _access_cache.get(user_id, 0) > now:
+        return await aget_all_categories()
+    return await asyncio.to_thread(get_categories_if_authorized, user_id, now)
+
+
+async def aadd_category(name):
+    """Async version of add_category."""
+    return await asyncio.to_thread(add_category, name)
+
+
+async def adelete_category(category_id):
+    """Async version of delete_category."""
+    return await asyncio.to_thread(delete_category, category_id)
+
+
+async def aadd_video(title, video_type, path_or_url, category_id, thumbnail_path=None):
+    """Async version of add_video."""
+    return await asyncio.to_thread(
+        add_video, title, video_type, path_or_url, category_id, thumbnail_path
+    )
+
+
+async def aget_videos_by_category(category_id):
+    """Async version of get_videos_by_category."""
+    return await asyncio.to_thread(get_videos_by_category, category_id)
+
+
+async def aget_video(video_id):
+    """Async version of get_video."""
+    return await asyncio.to_thread(get_video, video_id)
+
+
+async def adelete_video(video_id):
+    """Async version of delete_video."""
+    return await asyncio.to_thread(delete_video, video_id)
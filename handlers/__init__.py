@@ -6,9 +6,11 @@
 from handlers.auth_handler import register_auth_handlers
 from handlers.category_handler import register_category_handlers
 from handlers.video_handler import register_video_handlers
+from handlers.message_handler import register_message_handler
 
 async def register_handlers(client):
     """Register all handlers."""
     await register_auth_handlers(client)
     await register_category_handlers(client)
-    await register_video_handlers(client) 
\ No newline at end of file
+    await register_video_handlers(client)
+    await register_message_handler(client) 
\ No newline at end of file
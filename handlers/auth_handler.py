@@ -7,14 +7,19 @@ import logging
 from telethon import events, Button
 from database import database
 from config import config
+from handlers.state import SCOPE_AUTH, set_state, get_state, clear_state
 
 logger = logging.getLogger(__name__)
 
 # States for the conversation handler
 STATE_WAITING_PASSWORD = 1
 
-# Store user states in memory (user_id -> state)
-user_states = {}
+# Static button layouts
+MAIN_MENU_BUTTONS = [
+    [Button.inline("📁 Categories", data="menu_categories")],
+    [Button.inline("🎬 Manage Videos", data="menu_manage_videos")],
+    [Button.inline("🗂 Manage Categories", data="menu_manage_categories")]
+]
 
 async def register_auth_handlers(client):
     """Register all authentication handlers."""
@@ -23,17 +28,14 @@ async def register_auth_handlers(client):
     async def start_handler(event):
         """Handle the /start command."""
         user_id = event.sender_id
-        username = event.sender.username
         
-        # Check if user is admin
+        # Admin has permanent access, no database record needed
         if user_id == config.ADMIN_ID:
-            # Grant permanent access to admin
-            database.save_user_access(user_id, username, expires_in=100 * 365 * 24 * 3600)  # ~100 years
             await show_main_menu(client, event)
             return
             
         # Check if user already has temporary access
-        if database.check_user_access(user_id):
+        if await database.acheck_user_access(user_id):
             await show_main_menu(client, event)
             return
             
@@ -42,37 +44,37 @@ async def register_auth_handlers(client):
             "Welcome to the Video Archive Bot!\n\n"
             "Please enter the access password to continue."
         )
-        user_states[user_id] = STATE_WAITING_PASSWORD
+        set_state(user_id, SCOPE_AUTH, STATE_WAITING_PASSWORD)
 
 
-    @client.on(events.NewMessage())
-    async def message_handler(event):
-        """Handle text messages for password verification."""
-        user_id = event.sender_id
-        
-        # Ignore if the message is a command or from admin
-        if event.message.text.startswith('/') or user_id == config.ADMIN_ID:
-            return
+async def handle_auth_message(client, event):
+    """Handle text messages for password verification."""
+    user_id = event.sender_id
+    
+    # Ignore if the message is a command or from admin
+    if event.message.text.startswith('/') or user_id == config.ADMIN_ID:
+        return
+    
+    # Check if waiting for password
+    current = get_state(user_id, SCOPE_AUTH)
+    if current and current[0] == STATE_WAITING_PASSWORD:
+        # Verify password
+        if event.text == config.ACCESS_PASSWORD:
+            # Grant temporary access
+            username = event.sender.username
+            await database.asave_user_access(user_id, username)
+            
+            # Clear the state
+            clear_state(user_id, SCOPE_AUTH)
             
-        # Check if waiting for password
-        if user_id in user_states and user_states[user_id] == STATE_WAITING_PASSWORD:
-            # Verify password
-            if event.text == config.ACCESS_PASSWORD:
-                # Grant temporary access
-                username = event.sender.username
-                database.save_user_access(user_id, username)
-                
-                # Clear the state
-                del user_states[user_id]
-                
-                await event.respond(
-                    "✅ Password correct! You now have access for 1 hour."
-                )
-                await show_main_menu(client, event)
-            else:
-                await event.respond(
-                    "❌ Incorrect password. Please try again or contact the administrator."
-                )
+            await event.respond(
+                "✅ Password correct! You now have access for 1 hour."
+            )
+            await show_main_menu(client, event)
+        else:
+            await event.respond(
+                "❌ Incorrect password. Please try again or contact the administrator."
+            )
 
 
 async def check_access(event):
@@ -89,19 +91,29 @@ async def check_access(event):
         return True
         
     # Check temporary access
-    return database.check_user_access(user_id)
+    return await database.acheck_user_access(user_id)
+
+
+async def check_access_and_get_categories(event):
+    """
+    Check access and fetch the category list in one database round trip.
+    
+    Returns:
+        list: Categories, or None if the user has no access
+    """
+    user_id = event.sender_id
+    
+    # Admin always has access
+    if user_id == config.ADMIN_ID:
+        return await database.aget_all_categories()
+    
+    return await database.aget_categories_if_authorized(user_id)
 
 
 async def show_main_menu(client, event):
     """Display the main menu with inline buttons."""
-    buttons = [
-        [Button.inline("📁 Categories", data="menu_categories")],
-        [Button.inline("🎬 Manage Videos", data="menu_manage_videos")],
-        [Button.inline("🗂 Manage Categories", data="menu_manage_categories")]
-    ]
-    
     await event.respond(
         "📋 **Main Menu**\n\n"
         "Please select an option:",
-        buttons=buttons
+        buttons=MAIN_MENU_BUTTONS
     ) 
\ No newline at end of file
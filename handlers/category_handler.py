@@ -3,11 +3,13 @@
 
 """Category handler for managing categories."""
 
+import asyncio
 import logging
 from telethon import events, Button
 from database import database
-from utils.media_utils import delete_video_files
-from handlers.auth_handler import check_access, show_main_menu
+from utils.media_utils import delete_video_files_async
+from handlers.auth_handler import check_access, check_access_and_get_categories, show_main_menu
+from handlers.state import SCOPE_CATEGORY, set_state, get_state, clear_state
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +17,15 @@ logger = logging.getLogger(__name__)
 STATE_WAITING_CATEGORY_NAME = 1
 STATE_CONFIRM_DELETE = 2
 
-# Store user states (user_id -> (state, context))
-user_states = {}
+# Static button layouts
+MANAGE_CATEGORIES_BUTTONS = [
+    [Button.inline("➕ Add Category", data="category_add")],
+    [Button.inline("➖ Delete Category", data="category_delete")],
+    [Button.inline("🔙 Back to Main Menu", data="back_to_main")]
+]
+CANCEL_BUTTON = Button.inline("Cancel", data="back_to_categories")
+BACK_TO_MANAGE_BUTTON = Button.inline("🔙 Back", data="menu_manage_categories")
+BACK_TO_MAIN_BUTTON = Button.inline("🔙 Back to Main Menu", data="back_to_main")
 
 
 async def register_category_handlers(client):
@@ -29,16 +38,10 @@ async def register_category_handlers(client):
             await event.answer("Access expired. Please restart the bot with /start.")
             return
         
-        buttons = [
-            [Button.inline("➕ Add Category", data="category_add")],
-            [Button.inline("➖ Delete Category", data="category_delete")],
-            [Button.inline("🔙 Back to Main Menu", data="back_to_main")]
-        ]
-        
         await event.edit(
             "🗂 **Manage Categories**\n\n"
             "Please select an action:",
-            buttons=buttons
+            buttons=MANAGE_CATEGORIES_BUTTONS
         )
 
 
@@ -50,30 +53,29 @@ async def register_category_handlers(client):
             return
         
         user_id = event.sender_id
-        user_states[user_id] = (STATE_WAITING_CATEGORY_NAME, {})
+        set_state(user_id, SCOPE_CATEGORY, STATE_WAITING_CATEGORY_NAME)
         
         await event.edit(
             "➕ **Add Category**\n\n"
             "Please send me the name of the new category, or click Cancel.",
-            buttons=[Button.inline("Cancel", data="back_to_categories")]
+            buttons=CANCEL_BUTTON
         )
 
 
     @client.on(events.CallbackQuery(pattern=r"category_delete"))
     async def on_category_delete(event):
         """Handle the delete category button."""
-        if not await check_access(event):
+        # Fetch all categories along with the access check
+        categories = await check_access_and_get_categories(event)
+        if categories is None:
             await event.answer("Access expired. Please restart the bot with /start.")
             return
         
-        # Fetch all categories
-        categories = database.get_all_categories()
-        
         if not categories:
             await event.edit(
                 "❌ **No categories found**\n\n"
                 "There are no categories to delete.",
-                buttons=[Button.inline("🔙 Back", data="menu_manage_categories")]
+                buttons=BACK_TO_MANAGE_BUTTON
             )
             return
         
@@ -82,7 +84,7 @@ async def register_category_handlers(client):
             [Button.inline(f"{cat['name']}", data=f"delete_cat_{cat['id']}")] 
             for cat in categories
         ]
-        buttons.append([Button.inline("Cancel", data="back_to_categories")])
+        buttons.append([CANCEL_BUTTON])
         
         await event.edit(
             "➖ **Delete Category**\n\n"
@@ -99,15 +101,15 @@ async def register_category_handlers(client):
             return
         
         # Extract category ID from callback data
-        category_id = int(event.data.decode().split('_')[2])
+        category_id = int(event.pattern_match.group(1))
         
         # Get category name for confirmation
-        categories = database.get_all_categories()
-        category_name = next((cat['name'] for cat in categories if cat['id'] == category_id), "Unknown")
+        category = await database.aget_category_by_id(category_id)
+        category_name = category['name'] if category else "Unknown"
         
         # Store category ID for later deletion
         user_id = event.sender_id
-        user_states[user_id] = (STATE_CONFIRM_DELETE, {'category_id': category_id})
+        set_state(user_id, SCOPE_CATEGORY, STATE_CONFIRM_DELETE, {'category_id': category_id})
         
         # Ask for confirmation
         buttons = [
@@ -131,19 +133,18 @@ async def register_category_handlers(client):
             return
         
         # Extract category ID from callback data
-        category_id = int(event.data.decode().split('_')[2])
+        category_id = int(event.pattern_match.group(1))
         
         # Delete the category and get associated videos
-        videos = database.delete_category(category_id)
+        videos = await database.adelete_category(category_id)
         
-        # Delete video files
-        for video in videos:
-            delete_video_files(video)
+        # Delete video files concurrently, off the event loop
+        await asyncio.gather(*(delete_video_files_async(video) for video in videos))
         
         await event.edit(
             "✅ **Category Deleted**\n\n"
             f"The category and all its videos have been successfully deleted.",
-            buttons=[Button.inline("🔙 Back", data="menu_manage_categories")]
+            buttons=BACK_TO_MANAGE_BUTTON
         )
 
 
@@ -156,20 +157,13 @@ async def register_category_handlers(client):
         
         # Clear user state
         user_id = event.sender_id
-        if user_id in user_states:
-            del user_states[user_id]
+        clear_state(user_id, SCOPE_CATEGORY)
         
         # Show manage categories menu
-        buttons = [
-            [Button.inline("➕ Add Category", data="category_add")],
-            [Button.inline("➖ Delete Category", data="category_delete")],
-            [Button.inline("🔙 Back to Main Menu", data="back_to_main")]
-        ]
-        
         await event.edit(
             "🗂 **Manage Categories**\n\n"
             "Please select an action:",
-            buttons=buttons
+            buttons=MANAGE_CATEGORIES_BUTTONS
         )
 
 
@@ -180,70 +174,70 @@ async def register_category_handlers(client):
             await event.answer("Access expired. Please restart the bot with /start.")
             return
         
-        # Clear user state
+        # Clear any pending conversation
         user_id = event.sender_id
-        if user_id in user_states:
-            del user_states[user_id]
+        clear_state(user_id)
         
         # Show main menu
         await show_main_menu(client, event)
 
 
-    @client.on(events.NewMessage())
-    async def on_message(event):
-        """Handle messages for category operations."""
-        user_id = event.sender_id
-        
-        # Check if user is in a state
-        if user_id not in user_states:
+async def handle_category_message(client, event):
+    """Handle messages for category operations."""
+    user_id = event.sender_id
+    
+    # Check if user is in a state
+    current = get_state(user_id, SCOPE_CATEGORY)
+    if current is None:
+        return
+    
+    state, context = current
+    
+    # Handle waiting for category name
+    if state == STATE_WAITING_CATEGORY_NAME:
+        category_name = event.text.strip()
+        
+        # Validate category name
+        if not category_name:
+            await event.respond(
+                "❌ **Invalid Name**\n\n"
+                "Category name cannot be empty. Please try again.",
+                buttons=CANCEL_BUTTON
+            )
             return
         
-        state, context = user_states[user_id]
+        # Add the category
+        category_id = await database.aadd_category(category_name)
         
-        # Handle waiting for category name
-        if state == STATE_WAITING_CATEGORY_NAME:
-            category_name = event.text.strip()
-            
-            # Validate category name
-            if not category_name:
-                await event.respond(
-                    "❌ **Invalid Name**\n\n"
-                    "Category name cannot be empty. Please try again.",
-                    buttons=[Button.inline("Cancel", data="back_to_categories")]
-                )
-                return
-            
-            # Add the category
-            category_id = database.add_category(category_name)
+        if category_id:
+            # Clear state
+            clear_state(user_id, SCOPE_CATEGORY)
             
-            if category_id:
-                # Clear state
-                del user_states[user_id]
-                
-                # Send success message
-                await event.respond(
-                    "✅ **Category Added**\n\n"
-                    f"The category '{category_name}' has been successfully added!",
-                    buttons=[Button.inline("🔙 Back", data="menu_manage_categories")]
-                )
-            else:
-                await event.respond(
-                    "❌ **Error**\n\n"
-                    "Failed to add category. It might already exist.",
-                    buttons=[Button.inline("🔙 Back", data="menu_manage_categories")]
-                )
+            # Send success message
+            await event.respond(
+                "✅ **Category Added**\n\n"
+                f"The category '{category_name}' has been successfully added!",
+                buttons=BACK_TO_MANAGE_BUTTON
+            )
+        else:
+            await event.respond(
+                "❌ **Error**\n\n"
+                "Failed to add category. It might already exist.",
+                buttons=BACK_TO_MANAGE_BUTTON
+            )
 
 
-async def show_categories_menu(client, event):
+async def show_categories_menu(client, event, categories=None):
     """Show the categories menu for video browsing."""
-    # Fetch all categories
-    categories = database.get_all_categories()
+    # Fetch all categories unless the caller already has them
+    if categories is None:
+        categories = await database.aget_all_categories()
     
     if not categories:
         await event.edit(
             "❌ **No Categories**\n\n"
             "There are no categories available yet.",
-            buttons=[Button.inline("🔙 Back to Main Menu", data="back_to_main")]
+            buttons=BACK_TO_MAIN_BUTTON
         )
         return
     
@@ -252,7 +246,7 @@ async def show_categories_menu(client, event):
         [Button.inline(f"{cat['name']}", data=f"browse_cat_{cat['id']}")] 
         for cat in categories
     ]
-    buttons.append([Button.inline("🔙 Back to Main Menu", data="back_to_main")])
+    buttons.append([BACK_TO_MAIN_BUTTON])
     
     await event.edit(
         "📁 **Categories**\n\n"
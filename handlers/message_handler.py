@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Message dispatcher routing conversation input to the owning handler."""
+
+import logging
+from telethon import events
+from handlers.state import user_states, SCOPE_AUTH, SCOPE_CATEGORY, SCOPE_VIDEO
+from handlers.auth_handler import handle_auth_message
+from handlers.category_handler import handle_category_message
+from handlers.video_handler import handle_video_message
+
+logger = logging.getLogger(__name__)
+
+# Conversation scope -> message handler
+SCOPE_HANDLERS = {
+    SCOPE_AUTH: handle_auth_message,
+    SCOPE_CATEGORY: handle_category_message,
+    SCOPE_VIDEO: handle_video_message,
+}
+
+
+async def register_message_handler(client):
+    """Register the single catch-all message handler."""
+    
+    @client.on(events.NewMessage())
+    async def on_message(event):
+        """Route a message to the handler owning the user's conversation."""
+        # Users without a pending conversation cost a single dict lookup
+        entry = user_states.get(event.sender_id)
+        if entry is None:
+            return
+        
+        handler = SCOPE_HANDLERS.get(entry[0])
+        if handler:
+            await handler(client, event)
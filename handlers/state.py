@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Conversation state shared by all handlers."""
+
+import time
+import asyncio
+from collections import OrderedDict
+from config import config
+
+# Conversation scopes
+SCOPE_AUTH = "auth"
+SCOPE_CATEGORY = "category"
+SCOPE_VIDEO = "video"
+
+
+class ExpiringStateStore:
+    """
+    Size-bounded mapping whose entries expire a fixed time after being set.
+    
+    Entries are kept in write order, so the oldest entry is always the next
+    to expire and the first to be evicted when the store is full.
+    """
+    
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+    
+    def __setitem__(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self.expire()
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        if item[0] <= time.monotonic():
+            del self._data[key]
+            return default
+        return item[1]
+    
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+    
+    def __contains__(self, key):
+        return self.get(key) is not None
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def expire(self):
+        """Drop all entries whose time has passed."""
+        now = time.monotonic()
+        while self._data:
+            key, (expires_at, _) = next(iter(self._data.items()))
+            if expires_at > now:
+                break
+            del self._data[key]
+
+
+# Store user states (user_id -> (scope, state, context))
+user_states = ExpiringStateStore(maxsize=config.STATE_MAX_USERS, ttl=config.STATE_TIMEOUT)
+
+
+def set_state(user_id, scope, state, context=None):
+    """Put a user into a conversation state within the given scope."""
+    user_states[user_id] = (scope, state, context if context is not None else {})
+
+
+def get_state(user_id, scope):
+    """
+    Get the user's conversation state for a scope.
+
+    Returns:
+        tuple: (state, context) or None if the user has no state in this scope
+    """
+    entry = user_states.get(user_id)
+    if entry is None or entry[0] != scope:
+        return None
+    return entry[1], entry[2]
+
+
+def clear_state(user_id, scope=None):
+    """Clear the user's conversation state (only if it belongs to scope, when given)."""
+    entry = user_states.get(user_id)
+    if entry is not None and (scope is None or entry[0] == scope):
+        user_states.pop(user_id, None)
+
+
+async def expire_states_loop(interval=config.STATE_EXPIRE_INTERVAL):
+    """Periodically drop expired states so memory is reclaimed without access."""
+    while True:
+        await asyncio.sleep(interval)
+        user_states.expire()
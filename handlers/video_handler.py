@@ -4,14 +4,19 @@
 """Video handler for managing videos."""
 
 import os
+import asyncio
 import logging
-import traceback
+import functools
 from telethon import events, Button
 from telethon.tl.types import DocumentAttributeVideo, MessageMediaPhoto
+from config import config
 from database import database
-from utils.media_utils import save_video_file, is_valid_url, delete_video_files
-from handlers.auth_handler import check_access
+from utils.media_utils import (
+    save_video_file, is_valid_url, delete_video_files_async, SUPPORTED_VIDEO_MIME_TYPES, EmptyVideoError
+)
+from handlers.auth_handler import check_access, check_access_and_get_categories
 from handlers.category_handler import show_categories_menu
+from handlers.state import SCOPE_VIDEO, set_state, get_state, clear_state
 
 logger = logging.getLogger(__name__)
 
@@ -20,103 +25,158 @@ STATE_WAITING_TITLE = 1
 STATE_WAITING_VIDEO = 2
 STATE_WAITING_CATEGORY = 3
 STATE_CONFIRM_DELETE = 4
+STATE_SAVING_VIDEO = 5
 
-# Store user states (user_id -> (state, context))
-user_states = {}
+# Thumbnails uploaded in parallel when browsing a category (kept low for Telegram rate limits)
+BROWSE_UPLOAD_CONCURRENCY = 3
+
+# Static button layouts
+MANAGE_VIDEOS_BUTTONS = [
+    [Button.inline("➕ Add Video", data="video_add")],
+    [Button.inline("➖ Delete Video", data="video_delete")],
+    [Button.inline("🔙 Back to Main Menu", data="back_to_main")]
+]
+CANCEL_BUTTON = Button.inline("Cancel", data="back_to_videos")
+BACK_TO_MANAGE_BUTTON = Button.inline("🔙 Back", data="menu_manage_videos")
+BACK_TO_DELETE_BUTTON = Button.inline("🔙 Back", data="video_delete")
+BACK_TO_CATEGORIES_BUTTON = Button.inline("🔙 Back", data="menu_categories")
+RETURN_TO_MAIN_BUTTON = Button.inline("⬅️ Return to Main Menu", data="back_to_main")
+
+# Outbound Telegram requests in flight at once across all users (under the ~30 msg/s limit)
+API_CONCURRENCY = 25
+API_SEMAPHORE = asyncio.Semaphore(API_CONCURRENCY)
+
+# File uploads in flight at once, kept apart from API_SEMAPHORE so a few long
+# uploads can't hold the slots that messages and callback answers need
+UPLOAD_CONCURRENCY = 4
+UPLOAD_SEMAPHORE = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+# Background video downloads (referenced until they finish so they aren't collected)
+_background_tasks = set()
+
+
+def _category_key(categories):
+    """Turn category rows into a hashable key for the button cache."""
+    return tuple((cat['id'], cat['name']) for cat in categories)
+
+
+@functools.lru_cache(maxsize=32)
+def _build_category_buttons(categories, data_prefix):
+    """Build one button row per (id, name) category plus a trailing Cancel row."""
+    rows = tuple(
+        (Button.inline(f"{name}", data=f"{data_prefix}{cat_id}"),)
+        for cat_id, name in categories
+    )
+    return rows + ((CANCEL_BUTTON,),)
+
+
+def _list_thumbnails():
+    """Get the set of file names currently in the thumbnail directory."""
+    try:
+        with os.scandir(config.THUMBNAIL_DIR) as entries:
+            return {entry.name for entry in entries}
+    except OSError:
+        return set()
+
+
+def _thumbnail_exists(thumbnail_path, existing_thumbnails):
+    """Check a thumbnail against a directory listing, stat-ing only paths outside it."""
+    if not thumbnail_path:
+        return False
+    if os.path.dirname(thumbnail_path) == config.THUMBNAIL_DIR:
+        return os.path.basename(thumbnail_path) in existing_thumbnails
+    return os.path.exists(thumbnail_path)
+
+
+async def _send(coro):
+    """Await an outbound Telegram request once a shared API slot is free."""
+    async with API_SEMAPHORE:
+        return await coro
+
+
+async def _upload(coro):
+    """Await a file upload once an upload slot is free."""
+    async with UPLOAD_SEMAPHORE:
+        return await coro
 
 
 async def register_video_handlers(client):
     """Register all video-related handlers."""
     
-    @client.on(events.CallbackQuery(pattern=r"menu_manage_videos"))
     async def on_manage_videos(event):
         """Handle the video management menu button."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
-        buttons = [
-            [Button.inline("➕ Add Video", data="video_add")],
-            [Button.inline("➖ Delete Video", data="video_delete")],
-            [Button.inline("🔙 Back to Main Menu", data="back_to_main")]
-        ]
-        
-        await event.edit(
+        await _send(event.edit(
             "🎬 **Manage Videos**\n\n"
             "Please select an action:",
-            buttons=buttons
-        )
+            buttons=MANAGE_VIDEOS_BUTTONS
+        ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"video_add"))
     async def on_video_add(event):
         """Handle the add video button."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
         user_id = event.sender_id
         # Set state to waiting for title
-        user_states[user_id] = (STATE_WAITING_TITLE, {})
+        set_state(user_id, SCOPE_VIDEO, STATE_WAITING_TITLE)
         
-        await event.edit(
+        await _send(event.edit(
             "➕ **Add Video**\n\n"
             "Please send me the title of the new video, or click Cancel.",
-            buttons=[Button.inline("Cancel", data="back_to_videos")]
-        )
+            buttons=CANCEL_BUTTON
+        ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"video_delete"))
     async def on_video_delete(event):
         """Handle the delete video button."""
-        if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+        # Fetch all categories (cached) along with the access check
+        categories = await check_access_and_get_categories(event)
+        if categories is None:
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
-        # Fetch all categories
-        categories = database.get_all_categories()
-        
         if not categories:
-            await event.edit(
+            await _send(event.edit(
                 "❌ **No categories found**\n\n"
                 "There are no categories with videos to delete.",
-                buttons=[Button.inline("🔙 Back", data="menu_manage_videos")]
-            )
+                buttons=BACK_TO_MANAGE_BUTTON
+            ))
             return
         
         # Create buttons for each category
-        buttons = [
-            [Button.inline(f"{cat['name']}", data=f"delete_video_cat_{cat['id']}")] 
-            for cat in categories
-        ]
-        buttons.append([Button.inline("Cancel", data="back_to_videos")])
+        buttons = _build_category_buttons(_category_key(categories), "delete_video_cat_")
         
-        await event.edit(
+        await _send(event.edit(
             "➖ **Delete Video**\n\n"
             "Select a category first:",
             buttons=buttons
-        )
+        ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"delete_video_cat_(\d+)"))
     async def on_delete_video_category_selected(event):
         """Handle selection of a category for video deletion."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
         # Extract category ID from callback data
-        category_id = int(event.data.decode().split('_')[3])
+        category_id = int(event.data.rsplit(b'_', 1)[1])
         
         # Get all videos in this category
-        videos = database.get_videos_by_category(category_id)
+        videos = await database.aget_videos_by_category(category_id)
         
         if not videos:
-            await event.edit(
+            await _send(event.edit(
                 "❌ **No videos found**\n\n"
                 "There are no videos in this category.",
-                buttons=[Button.inline("🔙 Back", data="video_delete")]
-            )
+                buttons=BACK_TO_DELETE_BUTTON
+            ))
             return
         
         # Create buttons for each video
@@ -126,36 +186,35 @@ async def register_video_handlers(client):
         ]
         buttons.append([Button.inline("Cancel", data="video_delete")])
         
-        await event.edit(
+        await _send(event.edit(
             "➖ **Delete Video**\n\n"
             "Select a video to delete:",
             buttons=buttons
-        )
+        ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"delete_video_(\d+)"))
     async def on_delete_video_selected(event):
         """Handle selection of a video for deletion."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
         # Extract video ID from callback data
-        video_id = int(event.data.decode().split('_')[2])
+        video_id = int(event.data.rsplit(b'_', 1)[1])
         
         # Get video details
-        video = database.get_video(video_id)
+        video = await database.aget_video(video_id)
         if not video:
-            await event.edit(
+            await _send(event.edit(
                 "❌ **Error**\n\n"
                 "Video not found. It might have been deleted already.",
-                buttons=[Button.inline("🔙 Back", data="video_delete")]
-            )
+                buttons=BACK_TO_DELETE_BUTTON
+            ))
             return
         
         # Store video ID for later deletion
         user_id = event.sender_id
-        user_states[user_id] = (STATE_CONFIRM_DELETE, {'video_id': video_id})
+        set_state(user_id, SCOPE_VIDEO, STATE_CONFIRM_DELETE, {'video_id': video_id})
         
         # Ask for confirmation
         buttons = [
@@ -163,92 +222,82 @@ async def register_video_handlers(client):
             [Button.inline("No, cancel", data="video_delete")]
         ]
         
-        await event.edit(
+        await _send(event.edit(
             f"⚠️ **Confirm Deletion**\n\n"
             f"Are you sure you want to delete the video **{video['title']}**?",
             buttons=buttons
-        )
+        ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"confirm_delete_video_(\d+)"))
     async def on_confirm_delete_video(event):
         """Handle confirmation of video deletion."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
         # Extract video ID from callback data
-        video_id = int(event.data.decode().split('_')[3])
+        video_id = int(event.data.rsplit(b'_', 1)[1])
         
         # Delete the video
-        video = database.delete_video(video_id)
+        video = await database.adelete_video(video_id)
         
         if video:
-            # Delete video file
-            delete_video_files(video)
+            # Delete video file without blocking the event loop
+            await delete_video_files_async(video)
             
-            await event.edit(
+            await _send(event.edit(
                 "✅ **Video Deleted**\n\n"
                 f"The video '{video['title']}' has been successfully deleted.",
-                buttons=[Button.inline("🔙 Back", data="menu_manage_videos")]
-            )
+                buttons=BACK_TO_MANAGE_BUTTON
+            ))
         else:
-            await event.edit(
+            await _send(event.edit(
                 "❌ **Error**\n\n"
                 "Failed to delete video. It might have been deleted already.",
-                buttons=[Button.inline("🔙 Back", data="menu_manage_videos")]
-            )
+                buttons=BACK_TO_MANAGE_BUTTON
+            ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"back_to_videos"))
     async def on_back_to_videos(event):
         """Handle back to videos button."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
         # Clear user state
         user_id = event.sender_id
-        if user_id in user_states:
-            del user_states[user_id]
+        clear_state(user_id, SCOPE_VIDEO)
         
         # Show manage videos menu
-        buttons = [
-            [Button.inline("➕ Add Video", data="video_add")],
-            [Button.inline("➖ Delete Video", data="video_delete")],
-            [Button.inline("🔙 Back to Main Menu", data="back_to_main")]
-        ]
-        
-        await event.edit(
+        await _send(event.edit(
             "🎬 **Manage Videos**\n\n"
             "Please select an action:",
-            buttons=buttons
-        )
+            buttons=MANAGE_VIDEOS_BUTTONS
+        ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"select_category_(\d+)"))
     async def on_category_selected(event):
         """Handle category selection for adding a video."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
         user_id = event.sender_id
-        if user_id not in user_states:
-            await event.edit(
+        current = get_state(user_id, SCOPE_VIDEO)
+        if current is None:
+            await _send(event.edit(
                 "❌ **Error**\n\n"
                 "Session expired. Please start over.",
                 buttons=[Button.inline("🔙 Back", data="video_add")]
-            )
+            ))
             return
         
         # Extract category ID from callback data
-        category_id = int(event.data.decode().split('_')[2])
+        category_id = int(event.data.rsplit(b'_', 1)[1])
         
         # Update user context with selected category
-        state, context = user_states[user_id]
+        state, context = current
         context['category_id'] = category_id
-        user_states[user_id] = (state, context)
         
         # Get the video data from context
         title = context.get('title')
@@ -257,357 +306,479 @@ async def register_video_handlers(client):
         thumbnail_path = context.get('thumbnail_path')
         
         # Add the video to the database
-        video_id = database.add_video(title, video_type, path_or_url, category_id, thumbnail_path)
+        video_id = await database.aadd_video(title, video_type, path_or_url, category_id, thumbnail_path)
         
         if video_id:
             # Clear user state
-            del user_states[user_id]
+            clear_state(user_id, SCOPE_VIDEO)
             
             # Show success message
-            await event.edit(
+            await _send(event.edit(
                 "✅ **Video Added**\n\n"
                 f"The video '{title}' has been successfully added!",
-                buttons=[Button.inline("🔙 Back", data="menu_manage_videos")]
-            )
+                buttons=BACK_TO_MANAGE_BUTTON
+            ))
         else:
-            await event.edit(
+            await _send(event.edit(
                 "❌ **Error**\n\n"
                 "Failed to add video to the database.",
-                buttons=[Button.inline("🔙 Back", data="menu_manage_videos")]
-            )
+                buttons=BACK_TO_MANAGE_BUTTON
+            ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"menu_categories"))
     async def on_categories_menu(event):
         """Handle the categories menu button."""
-        if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+        categories = await check_access_and_get_categories(event)
+        if categories is None:
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
-        await show_categories_menu(client, event)
+        await show_categories_menu(client, event, categories)
 
 
-    @client.on(events.CallbackQuery(pattern=r"browse_cat_(\d+)"))
     async def on_browse_category(event):
         """Handle selection of a category for browsing."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
         # Extract category ID from callback data
-        category_id = int(event.data.decode().split('_')[2])
+        category_id = int(event.data.rsplit(b'_', 1)[1])
         
-        # Get all categories for name lookup
-        categories = database.get_all_categories()
-        category_name = next((cat['name'] for cat in categories if cat['id'] == category_id), "Unknown")
+        # Look up the category name (served from the category cache)
+        category = await database.aget_category_by_id(category_id)
+        category_name = category['name'] if category else "Unknown"
         
         # Get all videos in this category
-        videos = database.get_videos_by_category(category_id)
+        videos = await database.aget_videos_by_category(category_id)
         
         if not videos:
-            await event.edit(
+            await _send(event.edit(
                 f"📁 **{category_name}**\n\n"
                 "There are no videos in this category.",
-                buttons=[Button.inline("🔙 Back", data="menu_categories")]
-            )
+                buttons=BACK_TO_CATEGORIES_BUTTON
+            ))
             return
         
         # Tell user we're sending videos
-        await event.edit(
+        await _send(event.edit(
             f"📁 **{category_name}**\n\n"
             "Sending videos in this category...",
-            buttons=[Button.inline("🔙 Back", data="menu_categories")]
-        )
-        
-        # Send each video
-        for video in videos:
-            # Create view button
-            if video['type'] == 'file':
-                caption = f"🎬 **{video['title']}**"
-                buttons = [[Button.inline("▶️ View Video", data=f"play_video_{video['id']}")]]
+            buttons=BACK_TO_CATEGORIES_BUTTON
+        ))
+        
+        # List the thumbnail directory once instead of stat-ing every thumbnail
+        existing_thumbnails = _list_thumbnails()
+        
+        # Upload thumbnails a few at a time ahead of sending, but send the
+        # messages one by one so they arrive in the listing's (title) order
+        upload_slots = asyncio.Semaphore(BROWSE_UPLOAD_CONCURRENCY)
+        
+        async def _upload_thumbnail(video):
+            if video['type'] != 'file' or not _thumbnail_exists(video['thumbnail_path'], existing_thumbnails):
+                return None
+            async with upload_slots:
+                return await _upload(client.upload_file(video['thumbnail_path']))
+        
+        uploads = [asyncio.create_task(_upload_thumbnail(video)) for video in videos]
+        
+        for video, upload in zip(videos, uploads):
+            try:
+                thumbnail = await upload
                 
-                # Send thumbnail with caption and button
-                if video['thumbnail_path'] and os.path.exists(video['thumbnail_path']):
-                    await client.send_file(
-                        event.chat_id,
-                        file=video['thumbnail_path'],
-                        caption=caption,
-                        buttons=buttons
-                    )
+                # Create view button
+                if video['type'] == 'file':
+                    caption = f"🎬 **{video['title']}**"
+                    buttons = [[Button.inline("▶️ View Video", data=f"play_video_{video['id']}")]]
+                    
+                    # Send thumbnail with caption and button
+                    if thumbnail is not None:
+                        await _send(client.send_file(
+                            event.chat_id,
+                            file=thumbnail,
+                            caption=caption,
+                            buttons=buttons
+                        ))
+                    else:
+                        # No thumbnail, just send text
+                        await _send(client.send_message(
+                            event.chat_id,
+                            caption,
+                            buttons=buttons
+                        ))
                 else:
-                    # No thumbnail, just send text
-                    await client.send_message(
+                    # Link type video
+                    url = video['path_or_url']
+                    caption = f"🔗 **{video['title']}**\n\n{url}"
+                    await _send(client.send_message(
                         event.chat_id,
                         caption,
-                        buttons=buttons
-                    )
-            else:
-                # Link type video
-                url = video['path_or_url']
-                caption = f"🔗 **{video['title']}**\n\n{url}"
-                await client.send_message(
-                    event.chat_id,
-                    caption,
-                    buttons=[[Button.url("🔗 Open Link", url)]]
-                )
+                        buttons=[[Button.url("🔗 Open Link", url)]]
+                    ))
+            except Exception as e:
+                logger.error("Error sending video %s: %s", video['id'], e)
         
         # Send completion message
-        await client.send_message(
+        await _send(client.send_message(
             event.chat_id,
             "✅ All videos in this category have been sent.",
-            buttons=[[Button.inline("⬅️ Return to Main Menu", data="back_to_main")]]
-        )
+            buttons=RETURN_TO_MAIN_BUTTON
+        ))
 
 
-    @client.on(events.CallbackQuery(pattern=r"play_video_(\d+)"))
     async def on_play_video(event):
         """Handle playing a video file."""
         if not await check_access(event):
-            await event.answer("Access expired. Please restart the bot with /start.")
+            await _send(event.answer("Access expired. Please restart the bot with /start."))
             return
         
         # Extract video ID from callback data
-        video_id = int(event.data.decode().split('_')[2])
+        video_id = int(event.data.rsplit(b'_', 1)[1])
         
         # Get video details
-        video = database.get_video(video_id)
+        video = await database.aget_video(video_id)
         if not video:
-            await event.answer("Video not found. It might have been deleted.")
+            await _send(event.answer("Video not found. It might have been deleted."))
             return
         
         if video['type'] != 'file':
-            await event.answer("This is a link, not a file.")
+            await _send(event.answer("This is a link, not a file."))
             return
         
         # Send the video file
         if os.path.exists(video['path_or_url']):
-            await event.answer("Sending video...")
+            await _send(event.answer("Sending video..."))
             caption = f"🎬 **{video['title']}**"
-            await client.send_file(
+            await _upload(client.send_file(
                 event.chat_id,
                 file=video['path_or_url'],
                 caption=caption,
                 supports_streaming=True
-            )
+            ))
         else:
-            await event.answer("Video file not found on the server.")
+            await _send(event.answer("Video file not found on the server."))
 
 
-    @client.on(events.NewMessage())
-    async def on_message(event):
-        """Handle messages for video operations."""
-        user_id = event.sender_id
-        
-        # Check if user is in a state
-        if user_id not in user_states:
+    # Exact callback data -> handler
+    exact_handlers = {
+        b"menu_manage_videos": on_manage_videos,
+        b"video_add": on_video_add,
+        b"video_delete": on_video_delete,
+        b"back_to_videos": on_back_to_videos,
+        b"menu_categories": on_categories_menu,
+    }
+    
+    # Callback data prefix (followed by a numeric id) -> handler, longest prefix first
+    prefix_handlers = (
+        (b"confirm_delete_video_", on_confirm_delete_video),
+        (b"delete_video_cat_", on_delete_video_category_selected),
+        (b"select_category_", on_category_selected),
+        (b"delete_video_", on_delete_video_selected),
+        (b"browse_cat_", on_browse_category),
+        (b"play_video_", on_play_video),
+    )
+    
+    @client.on(events.CallbackQuery())
+    async def on_video_callback(event):
+        """Dispatch video-related callbacks with a dict lookup instead of one regex per handler."""
+        data = event.data
+        
+        handler = exact_handlers.get(data)
+        if handler:
+            await handler(event)
             return
         
-        state, context = user_states[user_id]
-        logger.info(f"Processing message from user {user_id} in state {state}")
+        for prefix, handler in prefix_handlers:
+            if data.startswith(prefix) and data[len(prefix):].isdigit():
+                await handler(event)
+                return
+
+
+async def handle_video_message(client, event):
+    """Handle messages for video operations."""
+    user_id = event.sender_id
+    
+    # Check if user is in a state
+    current = get_state(user_id, SCOPE_VIDEO)
+    if current is None:
+        return
+    
+    state, context = current
+    logger.info("Processing message from user %s in state %s", user_id, state)
+    
+    # Handle waiting for video title
+    if state == STATE_WAITING_TITLE:
+        title = event.text.strip()
+        logger.info("Received title: '%s'", title)
+        
+        if not title:
+            logger.warning("User %s provided empty title", user_id)
+            await _send(event.respond(
+                "❌ **Invalid Title**\n\n"
+                "Title cannot be empty. Please try again.",
+                buttons=CANCEL_BUTTON
+            ))
+            return
         
-        # Handle waiting for video title
-        if state == STATE_WAITING_TITLE:
-            title = event.text.strip()
-            logger.info(f"Received title: '{title}'")
+        # Save title and update state to waiting for video
+        context['title'] = title
+        set_state(user_id, SCOPE_VIDEO, STATE_WAITING_VIDEO, context)
+        logger.info("Title saved, user %s moved to STATE_WAITING_VIDEO", user_id)
+        
+        await _send(event.respond(
+            "🎬 **Video Upload**\n\n"
+            f"Title: **{title}**\n\n"
+            "Please send me one of the following:\n\n"
+            "1️⃣ **Video File**: Upload a video file from your device\n\n"
+            "2️⃣ **Video Link**: Send a link to a video from YouTube, Vimeo, or similar video platforms\n\n"
+            "Note: Video files must have a valid format and links must be from supported video platforms.",
+            buttons=CANCEL_BUTTON
+        ))
+        return
+    
+    # A download is still running for this user
+    elif state == STATE_SAVING_VIDEO:
+        await _send(event.respond(
+            "⏳ Your video is still downloading. Please wait.",
+            buttons=CANCEL_BUTTON
+        ))
+        return
+    
+    # Handle waiting for video
+    elif state == STATE_WAITING_VIDEO:
+        logger.info("Processing video or link from user %s", user_id)
+        # Check if it's a link
+        if event.text and not event.media:
+            url = event.text.strip()
+            logger.info("Received text as potential URL: %s", url)
             
-            if not title:
-                logger.warning(f"User {user_id} provided empty title")
-                await event.respond(
-                    "❌ **Invalid Title**\n\n"
-                    "Title cannot be empty. Please try again.",
-                    buttons=[Button.inline("Cancel", data="back_to_videos")]
-                )
+            if not is_valid_url(url):
+                logger.warning("Invalid URL received: %s", url)
+                await _send(event.respond(
+                    "❌ **Invalid URL**\n\n"
+                    "Please send a valid video URL from supported platforms like YouTube, Vimeo, etc.",
+                    buttons=CANCEL_BUTTON
+                ))
                 return
             
-            # Save title and update state to waiting for video
-            context['title'] = title
-            user_states[user_id] = (STATE_WAITING_VIDEO, context)
-            logger.info(f"Title saved, user {user_id} moved to STATE_WAITING_VIDEO")
+            # Save link and move to category selection
+            logger.info("Valid URL detected, saving: %s", url)
+            context['type'] = 'link'
+            context['path_or_url'] = url
+            set_state(user_id, SCOPE_VIDEO, STATE_WAITING_CATEGORY, context)
             
-            await event.respond(
-                "🎬 **Video Upload**\n\n"
-                f"Title: **{title}**\n\n"
-                "Please send me one of the following:\n\n"
-                "1️⃣ **Video File**: Upload a video file from your device\n\n"
-                "2️⃣ **Video Link**: Send a link to a video from YouTube, Vimeo, or similar video platforms\n\n"
-                "Note: Video files must have a valid format and links must be from supported video platforms.",
-                buttons=[Button.inline("Cancel", data="back_to_videos")]
-            )
+            # Ask user to select category
+            await show_category_selection(client, event, user_id)
             return
         
-        # Handle waiting for video
-        elif state == STATE_WAITING_VIDEO:
-            logger.info(f"Processing video or link from user {user_id}")
-            # Check if it's a link
-            if event.text and not event.media:
-                url = event.text.strip()
-                logger.info(f"Received text as potential URL: {url}")
-                
-                if not is_valid_url(url):
-                    logger.warning(f"Invalid URL received: {url}")
-                    await event.respond(
-                        "❌ **Invalid URL**\n\n"
-                        "Please send a valid video URL from supported platforms like YouTube, Vimeo, etc.",
-                        buttons=[Button.inline("Cancel", data="back_to_videos")]
-                    )
-                    return
-                
-                # Save link and move to category selection
-                logger.info(f"Valid URL detected, saving: {url}")
-                context['type'] = 'link'
-                context['path_or_url'] = url
-                user_states[user_id] = (STATE_WAITING_CATEGORY, context)
+        # Check if it's a video file
+        elif event.media:
+            try:
+                logger.info("Media received, type: %s", type(event.media).__name__)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Media attributes: %s", dir(event.media))
                 
-                # Ask user to select category
-                await show_category_selection(client, event, user_id)
-                return
-            
-            # Check if it's a video file
-            elif event.media:
-                try:
-                    logger.info(f"Media received, type: {type(event.media)}")
-                    logger.info(f"Media attributes: {dir(event.media)}")
+                # Handle webpage preview (MessageMediaWebPage) type - extract URL
+                if hasattr(event.media, 'webpage'):
+                    logger.info("MessageMediaWebPage detected, extracting URL")
                     
-                    # Handle webpage preview (MessageMediaWebPage) type - extract URL
-                    if hasattr(event.media, 'webpage'):
-                        logger.info(f"MessageMediaWebPage detected, extracting URL")
+                    # Check if we have a valid URL in the message text
+                    if event.text and is_valid_url(event.text.strip()):
+                        url = event.text.strip()
+                        logger.info("Valid URL extracted from webpage preview: %s", url)
                         
-                        # Check if we have a valid URL in the message text
-                        if event.text and is_valid_url(event.text.strip()):
-                            url = event.text.strip()
-                            logger.info(f"Valid URL extracted from webpage preview: {url}")
-                            
-                            # Save link and move to category selection
-                            context['type'] = 'link'
-                            context['path_or_url'] = url
-                            user_states[user_id] = (STATE_WAITING_CATEGORY, context)
-                            
-                            # Ask user to select category
-                            await show_category_selection(client, event, user_id)
-                            return
-                        # Check if the webpage has a URL we can use
-                        elif hasattr(event.media.webpage, 'url') and event.media.webpage.url:
-                            url = event.media.webpage.url
-                            logger.info(f"Valid URL extracted from webpage object: {url}")
-                            
-                            # Save link and move to category selection
-                            context['type'] = 'link'
-                            context['path_or_url'] = url
-                            user_states[user_id] = (STATE_WAITING_CATEGORY, context)
-                            
-                            # Ask user to select category
-                            await show_category_selection(client, event, user_id)
-                            return
-                        else:
-                            logger.warning("Could not extract a valid URL from webpage preview")
-                            await event.respond(
-                                "❌ **Invalid Link**\n\n"
-                                "Could not extract a valid URL from the webpage preview.",
-                                buttons=[Button.inline("Cancel", data="back_to_videos")]
-                            )
-                            return
-                    
-                    # Handle document type (video file)
-                    if hasattr(event.media, 'document'):
-                        logger.info(f"Document detected, mime_type: {event.media.document.mime_type if hasattr(event.media.document, 'mime_type') else 'unknown'}")
+                        # Save link and move to category selection
+                        context['type'] = 'link'
+                        context['path_or_url'] = url
+                        set_state(user_id, SCOPE_VIDEO, STATE_WAITING_CATEGORY, context)
+                        
+                        # Ask user to select category
+                        await show_category_selection(client, event, user_id)
+                        return
+                    # Check if the webpage has a URL we can use
+                    elif hasattr(event.media.webpage, 'url') and event.media.webpage.url:
+                        url = event.media.webpage.url
+                        logger.info("Valid URL extracted from webpage object: %s", url)
+                        
+                        # Save link and move to category selection
+                        context['type'] = 'link'
+                        context['path_or_url'] = url
+                        set_state(user_id, SCOPE_VIDEO, STATE_WAITING_CATEGORY, context)
                         
-                        if hasattr(event.media.document, 'mime_type') and event.media.document.mime_type.startswith('video/'):
-                            logger.info("Valid video file detected, proceeding to download")
-                            await event.respond("📥 Downloading video... Please wait.")
-                            
-                            # Save the video file
-                            try:
-                                video_path, thumbnail_path = await save_video_file(client, event)
-                                logger.info(f"Video saved to: {video_path}, thumbnail: {thumbnail_path}")
-                                
-                                if not video_path:
-                                    logger.error("Failed to save video file, path is None")
-                                    await event.respond(
-                                        "❌ **Error Saving File**\n\n"
-                                        "Failed to save video file. Please try again.",
-                                        buttons=[Button.inline("Cancel", data="back_to_videos")]
-                                    )
-                                    return
-                                
-                                # Save video path and move to category selection
-                                context['type'] = 'file'
-                                context['path_or_url'] = video_path
-                                context['thumbnail_path'] = thumbnail_path
-                                user_states[user_id] = (STATE_WAITING_CATEGORY, context)
-                                logger.info(f"Video successfully processed, moving to category selection")
-                                
-                                # Ask user to select category
-                                await show_category_selection(client, event, user_id)
-                                return
-                            except Exception as e:
-                                logger.error(f"Exception during video save: {str(e)}")
-                                logger.error(traceback.format_exc())
-                                await event.respond(
-                                    f"❌ **Error Saving Video**\n\n"
-                                    f"Error details: {str(e)}",
-                                    buttons=[Button.inline("Cancel", data="back_to_videos")]
-                                )
-                                return
-                        else:
-                            logger.warning("Media is not a video file or mime_type attribute missing")
-                            await event.respond(
-                                "❌ **Invalid File**\n\n"
-                                "Please send a valid video file.",
-                                buttons=[Button.inline("Cancel", data="back_to_videos")]
-                            )
-                            return
+                        # Ask user to select category
+                        await show_category_selection(client, event, user_id)
+                        return
                     else:
-                        logger.warning("Media doesn't have document attribute")
-                        await event.respond(
-                            "❌ **Link Processing Issue**\n\n"
-                            "If you're sharing a link, please copy and paste the URL directly in a message instead of using link previews or embedded content.\n\n"
-                            "For example, just type or paste: https://www.youtube.com/watch?v=example",
-                            buttons=[Button.inline("Cancel", data="back_to_videos")]
-                        )
+                        logger.warning("Could not extract a valid URL from webpage preview")
+                        await _send(event.respond(
+                            "❌ **Invalid Link**\n\n"
+                            "Could not extract a valid URL from the webpage preview.",
+                            buttons=CANCEL_BUTTON
+                        ))
                         return
-                except Exception as e:
-                    logger.error(f"Unexpected error processing media: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    await event.respond(
-                        f"❌ **Unexpected Error**\n\n"
-                        f"Error details: {str(e)}",
-                        buttons=[Button.inline("Cancel", data="back_to_videos")]
+                
+                # Handle document type (video file)
+                if hasattr(event.media, 'document'):
+                    logger.info(
+                        "Document detected, mime_type: %s",
+                        getattr(event.media.document, 'mime_type', 'unknown')
                     )
+                    
+                    if getattr(event.media.document, 'mime_type', None) in SUPPORTED_VIDEO_MIME_TYPES:
+                        logger.info("Valid video file detected, proceeding to download")
+                        progress = await _send(event.respond("📥 Downloading video... Please wait."))
+                        
+                        # Download in the background so this handler returns right away. The id
+                        # tells this download apart from any later one by the same user
+                        download_id = os.urandom(8).hex()
+                        context['download_id'] = download_id
+                        set_state(user_id, SCOPE_VIDEO, STATE_SAVING_VIDEO, context)
+                        task = asyncio.create_task(
+                            _save_video_in_background(client, event, user_id, context, progress, download_id)
+                        )
+                        _background_tasks.add(task)
+                        task.add_done_callback(_background_tasks.discard)
+                        return
+                    else:
+                        logger.warning("Media is not a supported video file or mime_type attribute missing")
+                        await _send(event.respond(
+                            "❌ **Invalid File**\n\n"
+                            "Please send a video file in MP4, WebM, MOV or MKV format.",
+                            buttons=CANCEL_BUTTON
+                        ))
+                        return
+                else:
+                    logger.warning("Media doesn't have document attribute")
+                    await _send(event.respond(
+                        "❌ **Link Processing Issue**\n\n"
+                        "If you're sharing a link, please copy and paste the URL directly in a message instead of using link previews or embedded content.\n\n"
+                        "For example, just type or paste: https://www.youtube.com/watch?v=example",
+                        buttons=CANCEL_BUTTON
+                    ))
                     return
-            else:
-                logger.warning(f"Invalid input: neither text nor media")
-                await event.respond(
-                    "❌ **Invalid Input**\n\n"
-                    "Please send either a video file or a video link.",
-                    buttons=[Button.inline("Cancel", data="back_to_videos")]
-                )
+            except Exception as e:
+                logger.exception("Unexpected error processing media: %s", e)
+                await _send(event.respond(
+                    f"❌ **Unexpected Error**\n\n"
+                    f"Error details: {str(e)}",
+                    buttons=CANCEL_BUTTON
+                ))
+                return
+        else:
+            logger.warning("Invalid input: neither text nor media")
+            await _send(event.respond(
+                "❌ **Invalid Input**\n\n"
+                "Please send either a video file or a video link.",
+                buttons=CANCEL_BUTTON
+            ))
+
+
+def _is_current_download(user_id, download_id):
+    """Whether the user is still waiting on this particular download."""
+    current = get_state(user_id, SCOPE_VIDEO)
+    return (
+        current is not None
+        and current[0] == STATE_SAVING_VIDEO
+        and current[1].get('download_id') == download_id
+    )
+
+
+async def _keep_saving_state_alive(user_id, context, download_id):
+    """Refresh the saving state so a long download doesn't let it expire."""
+    while True:
+        await asyncio.sleep(config.STATE_TIMEOUT / 2)
+        if not _is_current_download(user_id, download_id):
+            return
+        set_state(user_id, SCOPE_VIDEO, STATE_SAVING_VIDEO, context)
+
+
+async def _save_video_in_background(client, event, user_id, context, progress, download_id):
+    """Download a video file, then move the user on to category selection."""
+    keep_alive = asyncio.create_task(_keep_saving_state_alive(user_id, context, download_id))
+    try:
+        video_path, thumbnail_path = await save_video_file(client, event)
+        logger.info("Video saved to: %s, thumbnail: %s", video_path, thumbnail_path)
+    except EmptyVideoError:
+        logger.warning("Rejected empty video from user %s", user_id)
+        if not _is_current_download(user_id, download_id):
+            return
+        set_state(user_id, SCOPE_VIDEO, STATE_WAITING_VIDEO, context)
+        await _send(progress.edit(
+            "❌ **Empty Video**\n\n"
+            "This video has no picture. Please send a different video.",
+            buttons=CANCEL_BUTTON
+        ))
+        return
+    except Exception as e:
+        logger.exception("Exception during video save: %s", e)
+        if not _is_current_download(user_id, download_id):
+            return
+        set_state(user_id, SCOPE_VIDEO, STATE_WAITING_VIDEO, context)
+        await _send(progress.edit(
+            f"❌ **Error Saving Video**\n\n"
+            f"Error details: {str(e)}",
+            buttons=CANCEL_BUTTON
+        ))
+        return
+    finally:
+        keep_alive.cancel()
+    
+    # The user may have cancelled, or started over, while the download was running
+    if not _is_current_download(user_id, download_id):
+        logger.info("Upload cancelled by user %s during download, discarding files", user_id)
+        if video_path:
+            await delete_video_files_async({
+                'id': None,
+                'type': 'file',
+                'path_or_url': video_path,
+                'thumbnail_path': thumbnail_path
+            })
+        return
+    
+    if not video_path:
+        logger.error("Failed to save video file, path is None")
+        set_state(user_id, SCOPE_VIDEO, STATE_WAITING_VIDEO, context)
+        await _send(progress.edit(
+            "❌ **Error Saving File**\n\n"
+            "Failed to save video file. Please try again.",
+            buttons=CANCEL_BUTTON
+        ))
+        return
+    
+    # Save video path and move to category selection
+    context.pop('download_id', None)
+    context['type'] = 'file'
+    context['path_or_url'] = video_path
+    context['thumbnail_path'] = thumbnail_path
+    set_state(user_id, SCOPE_VIDEO, STATE_WAITING_CATEGORY, context)
+    logger.info("Video successfully processed, moving to category selection")
+    
+    await _send(progress.edit("✅ Video downloaded."))
+    
+    # Ask user to select category
+    await show_category_selection(client, event, user_id)
 
 
 async def show_category_selection(client, event, user_id):
     """Show category selection for adding a video."""
     # Fetch all categories
-    categories = database.get_all_categories()
+    categories = await database.aget_all_categories()
     
     if not categories:
-        await event.respond(
+        await _send(event.respond(
             "❌ **No categories found**\n\n"
             "Please add a category first.",
-            buttons=[Button.inline("🔙 Back", data="menu_manage_videos")]
-        )
+            buttons=BACK_TO_MANAGE_BUTTON
+        ))
         # Clear user state
-        if user_id in user_states:
-            del user_states[user_id]
+        clear_state(user_id, SCOPE_VIDEO)
         return
     
     # Create buttons for each category
-    buttons = [
-        [Button.inline(f"{cat['name']}", data=f"select_category_{cat['id']}")] 
-        for cat in categories
-    ]
-    buttons.append([Button.inline("Cancel", data="back_to_videos")])
+    buttons = _build_category_buttons(_category_key(categories), "select_category_")
     
-    await event.respond(
+    await _send(event.respond(
         "📁 **Select Category**\n\n"
         "Please select a category for this video:",
         buttons=buttons
-    ) 
\ No newline at end of file
+    )) 
\ No newline at end of file
@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os
+import sys
+import asyncio
 import logging
 from dotenv import load_dotenv
 from telethon import TelegramClient
 from config import config
-from database.database import init_db
+from database.database import init_db, close_pool
 from handlers import register_handlers
+from handlers.state import expire_states_loop
 
 # Setup logging
 logging.basicConfig(
@@ -20,10 +22,6 @@ async def main():
     """Main function to start the bot."""
     logger.info("Starting Telegram Video Archive Bot...")
     
-    # Create DATA directories if they don't exist
-    os.makedirs(config.VIDEO_DIR, exist_ok=True)
-    os.makedirs(config.THUMBNAIL_DIR, exist_ok=True)
-    
     # Initialize database
     init_db()
     
@@ -37,13 +35,28 @@ async def main():
     await client.start(bot_token=config.BOT_TOKEN)
     logger.info("Bot started successfully!")
     
+    # Drop abandoned conversation states in the background
+    expiry_task = asyncio.create_task(expire_states_loop())
+    
     # Run the client until disconnected
-    await client.run_until_disconnected()
+    try:
+        await client.run_until_disconnected()
+    finally:
+        expiry_task.cancel()
+        close_pool()
 
 if __name__ == "__main__":
     # Load environment variables
     load_dotenv()
     
+    # Use the libuv-based event loop where available (POSIX only)
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            logger.info("Using uvloop event loop")
+        except ImportError:
+            logger.info("uvloop not installed, using default asyncio event loop")
+    
     # Run the main function
-    import asyncio
     asyncio.run(main()) 
\ No newline at end of file
@@ -9,6 +9,9 @@
 import os
 import sys
 import glob
+import mmap
+import subprocess
+from multiprocessing import Pool
 
 # تلاش برای واردکردن کتابخانه PIL
 try:
@@ -19,9 +22,53 @@ except ImportError:
     HAS_PIL = False
     print("PIL/Pillow not available - conversion may not work properly")
 
+# تلاش برای واردکردن libjpeg-turbo (کدگذاری JPEG با SIMD، سریع‌تر از PIL)
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _turbo = TurboJPEG()
+    HAS_TURBOJPEG = True
+    print("libjpeg-turbo available - will use it for JPEG encoding")
+except (ImportError, OSError, RuntimeError):
+    HAS_TURBOJPEG = False
+
 # دایرکتوری تامبنیل‌ها
 thumbnails_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "thumbnails")
 
+def read_ppm(ppm_path):
+    """خواندن یک فایل PPM باینری (P6) به صورت آرایه RGB با ابعاد (ارتفاع، عرض، ۳)."""
+    # نگاشت فایل به حافظه؛ آرایه خروجی مستقیما روی همین نگاشت ساخته می‌شود و کپی نمی‌شود
+    with open(ppm_path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    # هدر شامل چهار بخش است: P6، عرض، ارتفاع و بیشینه مقدار (خطوط # توضیح هستند)
+    tokens = []
+    pos = 0
+    while len(tokens) < 4:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b"#":
+            pos = data.find(b"\n", pos)
+            if pos < 0:
+                raise ValueError("هدر PPM ناقص است")
+            pos += 1
+            continue
+        end = pos
+        while end < len(data) and not data[end:end + 1].isspace():
+            end += 1
+        tokens.append(data[pos:end])
+        pos = end
+    
+    # دقیقا یک کاراکتر فاصله بعد از بیشینه مقدار می‌آید
+    pos += 1
+    magic, width, height, maxval = tokens
+    if magic != b"P6" or int(maxval) != 255:
+        raise ValueError(f"فرمت PPM پشتیبانی نمی‌شود: {magic.decode(errors='replace')}")
+    
+    width, height = int(width), int(height)
+    # آرایه به نگاشت ارجاع دارد و تا زمانی که آرایه زنده است نگاشت باز می‌ماند
+    return np.frombuffer(data, dtype=np.uint8, count=width * height * 3, offset=pos).reshape(height, width, 3)
+
 def convert_ppm_to_jpg(ppm_path):
     """تبدیل یک فایل PPM به JPG."""
     if not os.path.exists(ppm_path):
@@ -31,6 +78,17 @@ def convert_ppm_to_jpg(ppm_path):
     # تولید مسیر فایل JPG
     jpg_path = os.path.splitext(ppm_path)[0] + ".jpg"
     
+    if HAS_TURBOJPEG:
+        try:
+            # کدگذاری مستقیم پیکسل‌ها با libjpeg-turbo
+            rgb = read_ppm(ppm_path)
+            with open(jpg_path, "wb") as f:
+                f.write(_turbo.encode(rgb, quality=95, pixel_format=TJPF_RGB))
+            print(f"تصویر {ppm_path} به {jpg_path} تبدیل شد")
+            return jpg_path
+        except Exception as e:
+            print(f"خطا در تبدیل {ppm_path} با libjpeg-turbo، استفاده از PIL: {str(e)}")
+    
     if HAS_PIL:
         try:
             # باز کردن تصویر PPM با استفاده از PIL
@@ -46,16 +104,28 @@ def convert_ppm_to_jpg(ppm_path):
         print(f"کتابخانه PIL در دسترس نیست، نمی‌توان {ppm_path} را تبدیل کرد")
         return None
 
+def open_directory(path):
+    """باز کردن یک دایرکتوری در مدیر فایل سیستم بدون منتظر ماندن برای آن."""
+    opener = {"darwin": "open", "win32": "explorer", "linux": "xdg-open"}.get(sys.platform)
+    if opener is None:
+        return
+    try:
+        subprocess.Popen([opener, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except FileNotFoundError:
+        print(f"برنامه {opener} برای باز کردن دایرکتوری یافت نشد")
+
 def main():
     """تبدیل تمام تصاویر PPM به JPG."""
     # پیدا کردن تمام فایل‌های PPM
     ppm_files = glob.glob(os.path.join(thumbnails_dir, "*.ppm"))
     print(f"تعداد {len(ppm_files)} فایل PPM یافت شد")
     
-    # تبدیل هر فایل
+    # تبدیل موازی فایل‌ها روی تمام هسته‌های پردازنده
+    with Pool() as pool:
+        results = pool.map(convert_ppm_to_jpg, ppm_files)
+    
     converted = 0
-    for ppm_file in ppm_files:
-        jpg_path = convert_ppm_to_jpg(ppm_file)
+    for ppm_file, jpg_path in zip(ppm_files, results):
         if jpg_path:
             converted += 1
             # حذف فایل اصلی PPM بعد از تبدیل موفق
@@ -69,12 +139,7 @@ def main():
     
     # باز کردن دایرکتوری تامبنیل‌ها
     if converted > 0:
-        if sys.platform == "darwin":  # macOS
-            os.system(f"open {thumbnails_dir}")
-        elif sys.platform == "win32":  # Windows
-            os.system(f"explorer {thumbnails_dir}")
-        elif sys.platform == "linux" and os.path.exists("/usr/bin/xdg-open"):  # Linux with xdg-open
-            os.system(f"xdg-open {thumbnails_dir}")
+        open_directory(thumbnails_dir)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -11,8 +11,10 @@ import sys
 import json
 import time
 import random
+import subprocess
 import datetime
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 
 # تلاش برای واردکردن کتابخانه PIL
 try:
@@ -23,10 +25,20 @@ except ImportError:
     HAS_PIL = False
     print("PIL/Pillow not available - will use basic image generation methods")
 
+# تلاش برای واردکردن NumPy (محاسبه برداری پیکسل‌ها به جای حلقه پایتون)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 # دایرکتوری تامبنیل‌ها
 thumbnails_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "thumbnails")
 os.makedirs(thumbnails_dir, exist_ok=True)
 
+# خروجی JSON فشرده نوشته می‌شود؛ برای خروجی خوانا PRETTY_JSON=1 را تنظیم کنید
+JSON_FORMAT = {"indent": 2} if os.environ.get("PRETTY_JSON") else {"separators": (",", ":")}
+
 def generate_color_data(width=320, height=180, color=None):
     """تولید داده‌های تصویر رنگی ساده."""
     if color is None:
@@ -41,12 +53,27 @@ def generate_color_data(width=320, height=180, color=None):
         # ایجاد داده‌های PPM برای یک تصویر رنگی ساده
         ppm_header = f"P6\n{width} {height}\n255\n"
         
-        # تولید داده‌های پیکسل
-        pixel_data = bytearray()
-        for _ in range(width * height):
-            pixel_data.extend([color[0], color[1], color[2]])
+        # تولید داده‌های پیکسل با تکرار یک پیکسل (پر کردن در سطح C، بدون حلقه پایتون)
+        pixel_data = bytes(color) * (width * height)
         
-        return ppm_header.encode() + pixel_data
+        return ppm_header.encode(), pixel_data
+
+def gradient_array(width, height, color1, color2):
+    """محاسبه پیکسل‌های گرادیان افقی به صورت آرایه (ارتفاع، عرض، ۳) با NumPy."""
+    # یک سطر محاسبه می‌شود و در راستای عمودی تکرار می‌شود
+    x = np.arange(width)[:, None]
+    c1 = np.array(color1)
+    row = (c1 + (np.array(color2) - c1) * x // width).astype(np.uint8)
+    return np.ascontiguousarray(np.broadcast_to(row, (height, width, 3)))
+
+def gradient_row_bytes(width, color1, color2):
+    """محاسبه یک سطر گرادیان افقی به صورت بایت‌های RGB بدون نیاز به NumPy."""
+    # محاسبه درصد مکان در محور x برای هر کانال رنگ
+    return bytes(
+        c1 + (c2 - c1) * x // width
+        for x in range(width)
+        for c1, c2 in zip(color1, color2)
+    )
 
 def generate_gradient_image(width=320, height=180, color1=None, color2=None):
     """تولید یک تصویر گرادیان از رنگ 1 به رنگ 2."""
@@ -55,35 +82,24 @@ def generate_gradient_image(width=320, height=180, color1=None, color2=None):
     if color2 is None:
         color2 = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
     
-    if HAS_PIL:
-        # ایجاد تصویر با استفاده از PIL
-        img = Image.new('RGB', (width, height))
-        pixels = img.load()
-        
-        for y in range(height):
-            for x in range(width):
-                # محاسبه درصد مکان در محور x
-                r = color1[0] + (color2[0] - color1[0]) * x // width
-                g = color1[1] + (color2[1] - color1[1]) * x // width
-                b = color1[2] + (color2[2] - color1[2]) * x // width
-                pixels[x, y] = (r, g, b)
-        
-        return img
+    if HAS_PIL and HAS_NUMPY:
+        # ساخت مستقیم تصویر از آرایه پیکسل‌ها
+        return Image.fromarray(gradient_array(width, height, color1, color2), 'RGB')
+    elif HAS_PIL:
+        # ایجاد تصویر با استفاده از PIL: یک سطر تکرار شده و یک‌جا به تصویر کپی می‌شود
+        pixel_data = gradient_row_bytes(width, color1, color2) * height
+        return Image.frombytes('RGB', (width, height), pixel_data)
     else:
         # ایجاد داده‌های PPM برای تصویر گرادیان
         ppm_header = f"P6\n{width} {height}\n255\n"
         
-        # تولید داده‌های پیکسل
-        pixel_data = bytearray()
-        for y in range(height):
-            for x in range(width):
-                # محاسبه درصد مکان در محور x
-                r = color1[0] + (color2[0] - color1[0]) * x // width
-                g = color1[1] + (color2[1] - color1[1]) * x // width
-                b = color1[2] + (color2[2] - color1[2]) * x // width
-                pixel_data.extend([r, g, b])
+        if HAS_NUMPY:
+            return ppm_header.encode(), gradient_array(width, height, color1, color2)
+        
+        # تولید داده‌های پیکسل: همه سطرها یکسان‌اند، پس یک سطر ساخته و تکرار می‌شود
+        pixel_data = gradient_row_bytes(width, color1, color2) * height
         
-        return ppm_header.encode() + pixel_data
+        return ppm_header.encode(), pixel_data
 
 def save_image_file(data, filename, description=None):
     """ذخیره داده‌های تصویر به فایل JPG."""
@@ -96,19 +112,26 @@ def save_image_file(data, filename, description=None):
     if HAS_PIL and isinstance(data, Image.Image):
         # ذخیره تصویر PIL به فرمت JPG
         try:
-            data.save(filepath, "JPEG", quality=95)
+            # کیفیت ۸۵ برای تامبنیل کافی است و کدگذاری سریع‌تری از ۹۵ دارد
+            data.save(filepath, "JPEG", quality=85, optimize=False, progressive=False)
             print(f"تصویر PIL به فایل JPG ذخیره شد: {filepath}")
             return filepath
         except Exception as e:
             print(f"خطا در ذخیره تصویر PIL: {str(e)}")
             return None
-    elif not HAS_PIL and isinstance(data, bytes):
-        # تبدیل داده‌های PPM به فایل
+    elif not HAS_PIL and isinstance(data, tuple):
+        # تبدیل داده‌های PPM (هدر، پیکسل‌ها) به فایل
         try:
             # برای حالتی که PIL در دسترس نیست، فایل PPM را با پسوند jpg ذخیره می‌کنیم
             # (این کار آیدال نیست، اما برای نمایش کارکرد مناسب است)
+            # هدر و پیکسل‌ها جداگانه نوشته می‌شوند تا بافر بزرگ دیگری برای اتصال آن‌ها ساخته نشود
+            header, pixels = data
             with open(filepath, 'wb') as f:
-                f.write(data)
+                f.write(header)
+                if HAS_NUMPY and isinstance(pixels, np.ndarray):
+                    pixels.tofile(f)
+                else:
+                    f.write(pixels)
             print(f"داده‌های باینری به فایل JPG ذخیره شد: {filepath}")
             return filepath
         except Exception as e:
@@ -125,62 +148,46 @@ def get_timestamp():
 def generate_thumbnails(url="https://www.pornhub.com/view_video.php?viewkey=68012db864390"):
     """تولید تامبنیل‌های نمونه برای یک URL."""
     domain = urlparse(url).netloc
+    # همه تصاویر در یک لحظه تولید می‌شوند، پس زمان یک بار گرفته می‌شود
+    timestamp = get_timestamp()
     
-    # تولید چند تصویر نمونه
-    thumbnails = []
+    # تصاویر نمونه: (تابع تولید، آرگومان‌ها، نام فایل، توضیح فایل، روش، توضیح خلاصه)
+    tasks = [
+        # 1. تصویر ساده (رنگ قرمز)
+        (generate_color_data, {"color": (230, 30, 30)}, "thumbnail_red.jpg", "تصویر قرمز ساده",
+         "solid_color", "تصویر قرمز ساده به عنوان پیش‌فرض برای خطاها"),
+        # 2. تصویر ساده (رنگ آبی)
+        (generate_color_data, {"color": (30, 30, 230)}, "thumbnail_blue.jpg", "تصویر آبی ساده",
+         "solid_color", "تصویر آبی ساده به عنوان پیش‌فرض برای خطاها"),
+        # 3. تصویر گرادیان نارنجی به بنفش
+        (generate_gradient_image, {"color1": (255, 165, 0), "color2": (128, 0, 128)},
+         "thumbnail_gradient.jpg", "تصویر گرادیان", "gradient", "تصویر گرادیان نارنجی به بنفش"),
+        # 4. تصویر گرادیان دیگر با رنگ‌های تصادفی
+        (generate_gradient_image, {}, "thumbnail_gradient2.jpg", "تصویر گرادیان تصادفی",
+         "gradient_random", "تصویر گرادیان با رنگ‌های تصادفی"),
+    ]
     
-    # 1. تصویر ساده (رنگ قرمز)
-    red_image = generate_color_data(color=(230, 30, 30))
-    red_path = save_image_file(red_image, "thumbnail_red.jpg", "تصویر قرمز ساده")
-    if red_path:
-        thumbnails.append({
-            "path": red_path,
-            "method": "solid_color",
-            "description": "تصویر قرمز ساده به عنوان پیش‌فرض برای خطاها",
-            "timestamp": get_timestamp()
-        })
-    
-    # 2. تصویر ساده (رنگ آبی)
-    blue_image = generate_color_data(color=(30, 30, 230))
-    blue_path = save_image_file(blue_image, "thumbnail_blue.jpg", "تصویر آبی ساده")
-    if blue_path:
-        thumbnails.append({
-            "path": blue_path,
-            "method": "solid_color",
-            "description": "تصویر آبی ساده به عنوان پیش‌فرض برای خطاها",
-            "timestamp": get_timestamp()
-        })
-    
-    # 3. تصویر گرادیان
-    gradient_image = generate_gradient_image(
-        color1=(255, 165, 0),  # نارنجی
-        color2=(128, 0, 128)   # بنفش
-    )
-    gradient_path = save_image_file(gradient_image, "thumbnail_gradient.jpg", "تصویر گرادیان")
-    if gradient_path:
-        thumbnails.append({
-            "path": gradient_path,
-            "method": "gradient",
-            "description": "تصویر گرادیان نارنجی به بنفش",
-            "timestamp": get_timestamp()
-        })
+    def run_task(task):
+        generator, kwargs, filename, file_description, method, description = task
+        path = save_image_file(generator(**kwargs), filename, file_description)
+        if not path:
+            return None
+        return {
+            "path": path,
+            "method": method,
+            "description": description,
+            "timestamp": timestamp
+        }
     
-    # 4. تصویر گرادیان دیگر
-    gradient_image2 = generate_gradient_image()  # رنگ‌های تصادفی
-    gradient_path2 = save_image_file(gradient_image2, "thumbnail_gradient2.jpg", "تصویر گرادیان تصادفی")
-    if gradient_path2:
-        thumbnails.append({
-            "path": gradient_path2,
-            "method": "gradient_random",
-            "description": "تصویر گرادیان با رنگ‌های تصادفی",
-            "timestamp": get_timestamp()
-        })
+    # تولید و ذخیره موازی تصاویر (کدگذاری JPEG در PIL قفل GIL را آزاد می‌کند)
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        thumbnails = [t for t in executor.map(run_task, tasks) if t]
     
     # ذخیره خلاصه به صورت JSON
     summary = {
         "url": url,
         "domain": domain,
-        "timestamp": get_timestamp(),
+        "timestamp": timestamp,
         "thumbnails": thumbnails,
         "methods_tested": ["solid_color", "gradient"],
         "total_thumbnails": len(thumbnails)
@@ -188,7 +195,7 @@ def generate_thumbnails(url="https://www.pornhub.com/view_video.php?viewkey=6801
     
     summary_path = os.path.join(thumbnails_dir, "summary.json")
     with open(summary_path, 'w', encoding='utf-8') as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
+        json.dump(summary, f, ensure_ascii=False, **JSON_FORMAT)
     
     print(f"خلاصه در مسیر {summary_path} ذخیره شد")
     print(f"تعداد {len(thumbnails)} تصویر در مسیر {thumbnails_dir} تولید شد")
@@ -203,17 +210,14 @@ if __name__ == "__main__":
     
     # سعی در باز کردن دایرکتوری تامبنیل‌ها در مرورگر فایل
     print("\nتلاش برای باز کردن دایرکتوری تامبنیل‌ها...")
+    opener = {"darwin": "open", "win32": "explorer", "linux": "xdg-open"}.get(sys.platform)
     try:
-        if sys.platform == "darwin":  # macOS
-            os.system(f"open {thumbnails_dir}")
-        elif sys.platform == "win32":  # Windows
-            os.system(f"explorer {thumbnails_dir}")
-        elif sys.platform == "linux" and os.path.exists("/usr/bin/xdg-open"):  # Linux
-            os.system(f"xdg-open {thumbnails_dir}")
+        if opener:
+            subprocess.Popen([opener, thumbnails_dir], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         else:
             print(f"لطفاً به صورت دستی به مسیر زیر بروید:")
             print(f"{os.path.abspath(thumbnails_dir)}")
     except Exception as e:
         print(f"خطا در باز کردن دایرکتوری: {str(e)}")
         print(f"لطفاً به صورت دستی به مسیر زیر بروید:")
-        print(f"{os.path.abspath(thumbnails_dir)}") 
\ No newline at end of file
+        print(f"{os.path.abspath(thumbnails_dir)}")
\ No newline at end of file
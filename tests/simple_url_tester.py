@@ -10,11 +10,12 @@ import os
 import sys
 import logging
 import urllib.request
+import urllib.error
 import urllib.parse
 import json
 import re
-import uuid
 import tempfile
+import subprocess
 from datetime import datetime
 
 # Configure logging
@@ -33,20 +34,119 @@ if parent_dir not in sys.path:
 try:
     from utils.media_utils import is_valid_url
 except ImportError:
-    # Define a simple version if not available
+    # Define a simple version if not available: optional scheme, then at least 3 non-space characters
+    _URL_RE = re.compile(r'^(?:https?://)?\S{3,}$')
+    
     def is_valid_url(url):
         """Basic URL validation."""
-        try:
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-                
-            if len(url) < 5:  # Minimum possible URL "h://x"
-                return False
-                
-            return True
-        except Exception as e:
-            logger.error(f"URL validation error: {str(e)}")
-            return False
+        return isinstance(url, str) and bool(_URL_RE.match(url))
+
+
+# Known video platforms: domains to match and compiled patterns capturing the video ID
+_PLATFORMS = {
+    'youtube': {
+        'domains': ('youtube.com', 'youtu.be', 'www.youtube.com'),
+        'patterns': tuple(re.compile(p) for p in (
+            r'youtube\.com/watch\?v=([a-zA-Z0-9_-]+)',
+            r'youtu\.be/([a-zA-Z0-9_-]+)',
+            r'youtube\.com/embed/([a-zA-Z0-9_-]+)'
+        ))
+    },
+    'vimeo': {
+        'domains': ('vimeo.com', 'player.vimeo.com'),
+        'patterns': tuple(re.compile(p) for p in (
+            r'vimeo\.com/(\d+)',
+            r'vimeo\.com/channels/[^/]+/(\d+)',
+            r'player\.vimeo\.com/video/(\d+)'
+        ))
+    },
+    'dailymotion': {
+        'domains': ('dailymotion.com', 'dai.ly'),
+        'patterns': tuple(re.compile(p) for p in (
+            r'dailymotion\.com/video/([a-zA-Z0-9]+)',
+            r'dai\.ly/([a-zA-Z0-9]+)'
+        ))
+    },
+    'facebook': {
+        'domains': ('facebook.com', 'fb.com', 'fb.watch'),
+        'patterns': tuple(re.compile(p) for p in (
+            r'facebook\.com/watch/?\?v=(\d+)',
+            r'fb\.watch/([^/]+)'
+        ))
+    },
+    'instagram': {
+        'domains': ('instagram.com', 'instagr.am'),
+        'patterns': tuple(re.compile(p) for p in (
+            r'instagram\.com/p/([^/]+)',
+            r'instagram\.com/tv/([^/]+)',
+            r'instagram\.com/reel/([^/]+)'
+        ))
+    },
+    'twitter': {
+        'domains': ('twitter.com', 'x.com'),
+        'patterns': tuple(re.compile(p) for p in (
+            r'twitter\.com/[^/]+/status/(\d+)',
+            r'x\.com/[^/]+/status/(\d+)'
+        ))
+    },
+    'pornhub': {
+        'domains': ('pornhub.com', 'www.pornhub.com'),
+        'patterns': tuple(re.compile(p) for p in (
+            r'pornhub\.com/view_video.php\?viewkey=([a-zA-Z0-9]+)',
+            r'pornhub\.com/embed/([a-zA-Z0-9]+)'
+        ))
+    }
+}
+
+# Host name -> platform, so a URL only runs the patterns of its own platform
+_DOMAIN_TO_PLATFORM = {
+    d.removeprefix('www.'): platform
+    for platform, info in _PLATFORMS.items()
+    for d in info['domains']
+}
+
+# Each platform's patterns fused into one alternation
+_PLATFORM_RES = {
+    platform: re.compile('|'.join(p.pattern for p in info['patterns']))
+    for platform, info in _PLATFORMS.items()
+}
+
+
+def _lookup_platform(host):
+    """Find the platform for a host name, falling back to parent domains (m.youtube.com -> youtube.com)."""
+    host = host.partition(':')[0]
+    while host:
+        platform = _DOMAIN_TO_PLATFORM.get(host)
+        if platform:
+            return platform
+        host = host.partition('.')[2]
+    return None
+
+
+# Ways Telegram might present a URL ({u}: the URL, {q}: the URL percent-encoded)
+_TELEGRAM_TEMPLATES = (
+    ('original', '{u}'),
+    ('with_t.me_prefix', 'https://t.me/share/url?url={q}'),
+    ('as_text', 'Check out this link: {u}'),
+    ('in_markdown', '[Link]({u})'),
+    ('in_html', '<a href="{u}">Link</a>'),
+)
+
+# Tests run for every URL, in order; each result has a fixed slot in results['tests']
+TEST_NAMES = ('connectivity', 'url_components', 'redirects', 'telegram_format', 'video_platform')
+_TEST_INDEX = {name: i for i, name in enumerate(TEST_NAMES)}
+
+
+class RedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Redirect handler that records every redirect it follows."""
+    
+    def __init__(self):
+        self.redirections = []
+    
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        self.redirections.append((code, newurl))
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
 
 class SimpleURLTester:
     """Test URL processing with minimal dependencies."""
@@ -63,17 +163,34 @@ class SimpleURLTester:
         os.makedirs(self.output_dir, exist_ok=True)
         logger.info(f"Output directory: {self.output_dir}")
         
+        # Results of every processed URL go to one newline-delimited JSON file
+        self.results_path = os.path.join(self.output_dir, "results.ndjson")
+        self._results_file = open(self.results_path, 'a', encoding='utf-8')
+        
         # User agent to mimic browser
         self.user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         
+        # Opener reused by redirect tests; its handler is reset before each request
+        self._redirect_handler = RedirectHandler()
+        self._opener = urllib.request.build_opener(self._redirect_handler)
+        
         # Initialize results
         self.results = {
             'url': None,
             'domain': None,
             'timestamp': datetime.now().isoformat(),
-            'tests': []
+            'tests': [None] * len(TEST_NAMES)
         }
     
+    def close(self):
+        """Close the results file."""
+        if not self._results_file.closed:
+            self._results_file.close()
+    
+    def __del__(self):
+        if hasattr(self, '_results_file'):
+            self.close()
+    
     def add_test_result(self, test_name, success, message=None, data=None):
         """Add a test result.
         
@@ -83,12 +200,12 @@ class SimpleURLTester:
             message: Optional message
             data: Optional data about the test
         """
-        self.results['tests'].append({
+        self.results['tests'][_TEST_INDEX[test_name]] = {
             'name': test_name,
             'success': success,
             'message': message,
             'data': data
-        })
+        }
         
         if success:
             logger.info(f"✅ {test_name}: {message}")
@@ -113,6 +230,7 @@ class SimpleURLTester:
             url = 'https://' + url
             
         self.results['url'] = url
+        self.results['tests'] = [None] * len(TEST_NAMES)
         parsed_url = urllib.parse.urlparse(url)
         self.results['domain'] = parsed_url.netloc
         
@@ -134,12 +252,11 @@ class SimpleURLTester:
         # Test for video platform
         self.test_video_platform(url)
         
-        # Save results to JSON file
-        result_path = os.path.join(self.output_dir, f"result_{uuid.uuid4().hex}.json")
-        with open(result_path, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        # Append results as one JSON line to the shared results file
+        self._results_file.write(json.dumps(self.results, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._results_file.flush()
         
-        logger.info(f"Results saved to: {result_path}")
+        logger.info(f"Results saved to: {self.results_path}")
         
         return self.results
     
@@ -150,11 +267,24 @@ class SimpleURLTester:
             url: URL to test
         """
         try:
+            # HEAD avoids downloading the body; fall back to GET for servers that reject it
             req = urllib.request.Request(
                 url, 
-                headers={'User-Agent': self.user_agent}
+                headers={'User-Agent': self.user_agent},
+                method='HEAD'
             )
-            with urllib.request.urlopen(req, timeout=10) as response:
+            try:
+                response = urllib.request.urlopen(req, timeout=10)
+            except urllib.error.HTTPError as e:
+                if e.code not in (405, 501):
+                    raise
+                req = urllib.request.Request(
+                    url, 
+                    headers={'User-Agent': self.user_agent}
+                )
+                response = urllib.request.urlopen(req, timeout=10)
+            
+            with response:
                 status_code = response.getcode()
                 content_type = response.getheader('Content-Type')
                 
@@ -165,7 +295,8 @@ class SimpleURLTester:
                     data={
                         'status_code': status_code,
                         'content_type': content_type,
-                        'headers': dict(response.getheaders())
+                        'server': response.getheader('Server'),
+                        'content_length': response.getheader('Content-Length')
                     }
                 )
         except Exception as e:
@@ -193,14 +324,7 @@ class SimpleURLTester:
             }
             
             # Parse query parameters
-            query_params = {}
-            if parsed.query:
-                for param in parsed.query.split('&'):
-                    if '=' in param:
-                        key, value = param.split('=', 1)
-                        query_params[key] = value
-                        
-            components['query_params'] = query_params
+            components['query_params'] = dict(urllib.parse.parse_qsl(parsed.query, keep_blank_values=True))
             
             self.add_test_result(
                 "url_components",
@@ -222,25 +346,16 @@ class SimpleURLTester:
             url: URL to test
         """
         try:
-            class RedirectHandler(urllib.request.HTTPRedirectHandler):
-                def __init__(self):
-                    self.redirections = []
-                
-                def redirect_request(self, req, fp, code, msg, headers, newurl):
-                    self.redirections.append((code, newurl))
-                    return super().redirect_request(req, fp, code, msg, headers, newurl)
-            
-            redirect_handler = RedirectHandler()
-            opener = urllib.request.build_opener(redirect_handler)
+            self._redirect_handler.redirections.clear()
             
             req = urllib.request.Request(
                 url, 
                 headers={'User-Agent': self.user_agent}
             )
             
-            with opener.open(req, timeout=10) as response:
+            with self._opener.open(req, timeout=10) as response:
                 final_url = response.geturl()
-                redirects = redirect_handler.redirections
+                redirects = list(self._redirect_handler.redirections)
                 
                 if redirects:
                     redirect_chain = " -> ".join([f"{code}: {url}" for code, url in redirects])
@@ -274,25 +389,16 @@ class SimpleURLTester:
             url: URL to test
         """
         # Simulate different ways Telegram might process the URL
-        variations = [
-            ('original', url),
-            ('with_t.me_prefix', f"https://t.me/share/url?url={urllib.parse.quote(url)}"),
-            ('as_text', f"Check out this link: {url}"),
-            ('in_markdown', f"[Link]({url})"),
-            ('in_html', f'<a href="{url}">Link</a>')
+        quoted = urllib.parse.quote(url, safe='')
+        results = [
+            {'type': name, 'url': template.format(u=url, q=quoted)}
+            for name, template in _TELEGRAM_TEMPLATES
         ]
         
-        results = []
-        for name, variant in variations:
-            results.append({
-                'type': name,
-                'url': variant
-            })
-        
         self.add_test_result(
             "telegram_format",
             success=True,
-            message=f"Generated {len(variations)} Telegram URL variations",
+            message=f"Generated {len(results)} Telegram URL variations",
             data=results
         )
     
@@ -306,77 +412,15 @@ class SimpleURLTester:
         domain = parsed.netloc.lower()
         path = parsed.path
         
-        platforms = {
-            'youtube': {
-                'domains': ['youtube.com', 'youtu.be', 'www.youtube.com'],
-                'patterns': [
-                    r'youtube\.com/watch\?v=([a-zA-Z0-9_-]+)',
-                    r'youtu\.be/([a-zA-Z0-9_-]+)',
-                    r'youtube\.com/embed/([a-zA-Z0-9_-]+)'
-                ]
-            },
-            'vimeo': {
-                'domains': ['vimeo.com', 'player.vimeo.com'],
-                'patterns': [
-                    r'vimeo\.com/(\d+)',
-                    r'vimeo\.com/channels/[^/]+/(\d+)',
-                    r'player\.vimeo\.com/video/(\d+)'
-                ]
-            },
-            'dailymotion': {
-                'domains': ['dailymotion.com', 'dai.ly'],
-                'patterns': [
-                    r'dailymotion\.com/video/([a-zA-Z0-9]+)',
-                    r'dai\.ly/([a-zA-Z0-9]+)'
-                ]
-            },
-            'facebook': {
-                'domains': ['facebook.com', 'fb.com', 'fb.watch'],
-                'patterns': [
-                    r'facebook\.com/watch/?\?v=(\d+)',
-                    r'fb\.watch/([^/]+)'
-                ]
-            },
-            'instagram': {
-                'domains': ['instagram.com', 'instagr.am'],
-                'patterns': [
-                    r'instagram\.com/p/([^/]+)',
-                    r'instagram\.com/tv/([^/]+)',
-                    r'instagram\.com/reel/([^/]+)'
-                ]
-            },
-            'twitter': {
-                'domains': ['twitter.com', 'x.com'],
-                'patterns': [
-                    r'twitter\.com/[^/]+/status/(\d+)',
-                    r'x\.com/[^/]+/status/(\d+)'
-                ]
-            },
-            'pornhub': {
-                'domains': ['pornhub.com', 'www.pornhub.com'],
-                'patterns': [
-                    r'pornhub\.com/view_video.php\?viewkey=([a-zA-Z0-9]+)',
-                    r'pornhub\.com/embed/([a-zA-Z0-9]+)'
-                ]
-            }
-        }
-        
         detected_platform = None
         detected_id = None
         
-        for platform, info in platforms.items():
-            # Check domain
-            if any(d in domain for d in info['domains']):
-                # Check patterns
-                for pattern in info['patterns']:
-                    match = re.search(pattern, url)
-                    if match:
-                        detected_platform = platform
-                        detected_id = match.group(1)
-                        break
-                        
-            if detected_platform:
-                break
+        platform = _lookup_platform(domain)
+        match = platform and _PLATFORM_RES[platform].search(url)
+        if match:
+            detected_platform = platform
+            # The ID is the group of whichever pattern matched
+            detected_id = next(g for g in match.groups() if g is not None)
         
         if detected_platform:
             self.add_test_result(
@@ -397,8 +441,9 @@ class SimpleURLTester:
     
     def print_summary(self):
         """Print summary of results."""
-        success_count = sum(1 for test in self.results['tests'] if test['success'])
-        total_count = len(self.results['tests'])
+        tests = [test for test in self.results['tests'] if test is not None]
+        success_count = sum(1 for test in tests if test['success'])
+        total_count = len(tests)
         
         print("\n" + "="*60)
         print(f"URL Test Results for: {self.results['url']}")
@@ -408,7 +453,7 @@ class SimpleURLTester:
         
         print("\nTest Results:")
         print("-"*60)
-        for test in self.results['tests']:
+        for test in tests:
             status = "✅ Success" if test['success'] else "❌ Failed"
             print(f"  {test['name']}: {status}")
             print(f"    {test['message']}")
@@ -427,7 +472,10 @@ def main():
     tester = SimpleURLTester()
     
     # Process URL
-    results = tester.process_url(url)
+    try:
+        results = tester.process_url(url)
+    finally:
+        tester.close()
     
     if results:
         # Print summary
@@ -438,12 +486,12 @@ def main():
         print(f"Results directory: {abs_output_dir}")
         
         # Open file explorer if platform supports it
-        if sys.platform == "darwin":  # macOS
-            os.system(f"open {abs_output_dir}")
-        elif sys.platform == "win32":  # Windows
-            os.system(f"explorer {abs_output_dir}")
-        elif sys.platform == "linux" and os.path.exists("/usr/bin/xdg-open"):  # Linux with xdg-open
-            os.system(f"xdg-open {abs_output_dir}")
+        opener = {'darwin': 'open', 'win32': 'explorer', 'linux': 'xdg-open'}.get(sys.platform)
+        if opener:
+            try:
+                subprocess.Popen([opener, abs_output_dir], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except FileNotFoundError:
+                logger.warning(f"Could not find '{opener}' to open the results directory")
     else:
         print(f"Failed to process URL: {url}")
 
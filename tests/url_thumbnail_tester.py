@@ -14,15 +14,42 @@ import logging
 import argparse
 import uuid
 import json
+import shutil
+import socket
+import functools
 import traceback
 import time
-from urllib.parse import urlparse
+import asyncio
+import threading
+from urllib.parse import urljoin, urlparse
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-from bs4 import BeautifulSoup
-import cv2
+from requests.adapters import HTTPAdapter
+from urllib3.util.connection import allowed_gai_family
 import re
 
+# orjson parses large JSON-LD blocks several times faster than the standard library
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# selectolax (C HTML parser) answers the meta tag queries much faster than BeautifulSoup
+try:
+    from selectolax.parser import HTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
+# Optional on-disk HTTP cache for repeated runs against the same URLs
+try:
+    import requests_cache
+    HAS_REQUESTS_CACHE = True
+except ImportError:
+    HAS_REQUESTS_CACHE = False
+
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -56,25 +83,176 @@ except ImportError:
             logger.error(f"URL validation error: {str(e)}")
             return False
 
+# Use tests/data/thumbnails as the default output directory instead of temp
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "thumbnails")
+
+# Video ID patterns for the platform-specific extractors
+_YOUTUBE_ID_RE = re.compile(r'(?:youtu\.be/|youtube\.com/(?:watch\?(?:[^#]*?&)?v=|embed/|shorts/))([A-Za-z0-9_-]{11})')
+_VIMEO_ID_RE = re.compile(r'vimeo\.com/(?:[^?#]*?/)?(\d+)(?=[/?#]|$)')
+_DAILYMOTION_ID_RE = re.compile(r'dailymotion\.com/video/([A-Za-z0-9]+)')
+
+# Image area (pixels) above which try_largest_image stops searching, e.g. 500x500
+GOOD_ENOUGH_IMAGE_AREA = 250000
+
+# End of the document head, and how much HTML to read while looking for it
+_HEAD_END_RE = re.compile(rb'</head\s*>', re.IGNORECASE)
+MAX_HEAD_BYTES = 512 * 1024
+
+# User agent to mimic browser
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Hosts the platform extractors talk to, resolved up front with --prewarm-dns
+PLATFORM_HOSTS = (
+    'img.youtube.com',
+    'vimeo.com',
+    'i.vimeocdn.com',
+    'www.dailymotion.com',
+)
+
+# Extra headers for image downloads, which are already compressed
+IMAGE_HEADERS = {
+    'Accept-Encoding': 'identity'
+}
+
+
+def _image_urls(value):
+    """Yield the URL strings of a Schema.org image value (URL, ImageObject or a list of them)."""
+    if isinstance(value, str):
+        if value:
+            yield value
+    elif isinstance(value, list):
+        for item in value:
+            yield from _image_urls(item)
+    elif isinstance(value, dict):
+        for key in ('url', 'contentUrl'):
+            if isinstance(value.get(key), str) and value[key]:
+                yield value[key]
+                break
+
+
+def _walk_images(node):
+    """Yield every image URL in a JSON-LD tree, depth first."""
+    if isinstance(node, dict):
+        if 'image' in node:
+            yield from _image_urls(node['image'])
+        for key, value in node.items():
+            if key != 'image':
+                yield from _walk_images(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk_images(item)
+
+
+def _meta_content(doc, selector):
+    """Get the content attribute of the first tag matching a CSS selector.
+    
+    Args:
+        doc: selectolax HTMLParser tree or BeautifulSoup
+        selector: CSS selector
+    """
+    if HAS_SELECTOLAX and isinstance(doc, HTMLParser):
+        node = doc.css_first(selector)
+        return node.attributes.get('content') if node else None
+    tag = doc.select_one(selector)
+    return tag.get('content') if tag else None
+
+
+def _script_texts(doc, selector):
+    """Get the text of every script tag matching a CSS selector.
+    
+    Args:
+        doc: selectolax HTMLParser tree or BeautifulSoup
+        selector: CSS selector
+    """
+    if HAS_SELECTOLAX and isinstance(doc, HTMLParser):
+        return [node.text() for node in doc.css(selector)]
+    return [tag.string for tag in doc.select(selector)]
+
+
+def create_session(output_dir, use_cache=True):
+    """Create an HTTP session with pooled keep-alive connections.
+    
+    Args:
+        output_dir: Directory for the on-disk cache
+        use_cache: Cache HTTP responses on disk (needs requests-cache)
+        
+    Returns:
+        requests.Session: Session with browser headers
+    """
+    # With requests-cache, pages and images fetched within the last hour are read from disk
+    if use_cache and HAS_REQUESTS_CACHE:
+        session = requests_cache.CachedSession(
+            os.path.join(output_dir, '.http_cache'),
+            backend='sqlite',
+            expire_after=3600,
+            allowable_methods=('GET', 'HEAD')
+        )
+    else:
+        session = requests.Session()
+    session.headers.update(HEADERS)
+    # One adapter for both schemes, so every method reuses the same pooled
+    # connections (and TLS sessions) per host
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, pool_block=False)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def prewarm_dns(hosts=PLATFORM_HOSTS):
+    """Resolve hosts once up front and answer later lookups from memory.
+    
+    Replaces socket.getaddrinfo with a cached version for the rest of the
+    process, then resolves the given hosts in parallel the way urllib3 does.
+    
+    Args:
+        hosts: Host names to resolve
+    """
+    socket.getaddrinfo = functools.lru_cache(maxsize=256)(socket.getaddrinfo)
+    
+    def resolve(host):
+        try:
+            socket.getaddrinfo(host, 443, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError as e:
+            logger.warning(f"Could not resolve {host}: {str(e)}")
+    
+    with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        list(executor.map(resolve, hosts))
+
+
 class URLThumbnailTester:
     """Test various methods to extract thumbnails from URLs."""
     
-    def __init__(self, output_dir=None):
+    def __init__(self, output_dir=None, use_cache=True, session=None, first_match=False):
         """Initialize the tester.
         
         Args:
             output_dir: Directory to save thumbnails
+            use_cache: Cache HTTP responses on disk (needs requests-cache)
+            session: Existing session to use instead of creating one
+            first_match: Skip the generic page methods when the platform extractor succeeds
         """
-        # Use tests/data/thumbnails as the default output directory instead of temp
-        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "thumbnails")
-        self.output_dir = output_dir or default_dir
+        self.output_dir = output_dir or DEFAULT_OUTPUT_DIR
         os.makedirs(self.output_dir, exist_ok=True)
         logger.info(f"Output directory: {self.output_dir}")
         
         # User agent to mimic browser
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        self.headers = HEADERS
+        
+        # Session shared with other testers in batch mode, or one of our own
+        self.session = session or create_session(self.output_dir, use_cache)
+        
+        self.first_match = first_match
+        
+        # urlparse() result of the URL being processed
+        self._parsed_url = None
+        
+        # Saved file by image URL, so an image found by several methods is downloaded once
+        self._image_cache = {}
+        
+        # Guards results, which the extraction methods update from worker threads
+        self._lock = threading.Lock()
         
         # Initialize results
         self.results = {
@@ -103,62 +281,148 @@ class URLThumbnailTester:
             url = 'https://' + url
             
         self.results['url'] = url
-        parsed_url = urlparse(url)
+        # Parsed once per URL and reused by everything below
+        self._parsed_url = parsed_url = urlparse(url)
         self.results['domain'] = parsed_url.netloc
         
         logger.info(f"Processing URL: {url}")
         logger.info(f"Domain: {self.results['domain']}")
         
         # Try different methods based on domain
+        platform_method = None
         if 'youtube.com' in parsed_url.netloc or 'youtu.be' in parsed_url.netloc:
             logger.info("Detected YouTube URL")
-            self.try_youtube_thumbnail(url)
+            platform_method = self.try_youtube_thumbnail
         elif 'vimeo.com' in parsed_url.netloc:
             logger.info("Detected Vimeo URL")
-            self.try_vimeo_thumbnail(url)
+            platform_method = self.try_vimeo_thumbnail
         elif 'dailymotion.com' in parsed_url.netloc:
             logger.info("Detected Dailymotion URL")
-            self.try_dailymotion_thumbnail(url)
+            platform_method = self.try_dailymotion_thumbnail
+        
+        # With first_match the platform extractor runs on its own first, and the page
+        # is only downloaded and parsed if it found nothing
+        if platform_method and self.first_match:
+            platform_method(url)
+            if self.results['successful_methods']:
+                return self.results
+            platform_method = None
         
-        # Try general methods for any URL
-        self.try_opengraph_thumbnail(url)
-        self.try_twitter_card_thumbnail(url)
-        self.try_schema_org_thumbnail(url)
-        self.try_largest_image(url)
-        self.try_screenshot_webpage(url)
+        # The extraction methods are independent network-bound tasks, so they run concurrently
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = []
+            if platform_method:
+                futures.append(executor.submit(platform_method, url))
+            
+            # Try general methods for any URL. The page is downloaded once: the meta tag
+            # methods start on <head> while the body (needed for <img> tags) is still arriving
+            pages = self._stream_html(url)
+            head = self._parse_head(next(pages, None))
+            for method in (self.try_opengraph_thumbnail, self.try_twitter_card_thumbnail,
+                           self.try_schema_org_thumbnail):
+                futures.append(executor.submit(method, url, head))
+            soup = self._parse_html(next(pages, None))
+            pages.close()
+            futures.append(executor.submit(self.try_largest_image, url, soup))
+            futures.append(executor.submit(self.try_screenshot_webpage, url))
+            
+            for future in futures:
+                future.result()
         
         return self.results
     
-    def save_image(self, image_data, method_name):
-        """Save image data to file.
+    async def process_url_async(self, url):
+        """Process URL from an asyncio event loop (such as the bot's) without blocking it.
         
         Args:
-            image_data: Raw image data or URL to image
-            method_name: Name of method that generated the thumbnail
+            url: URL to process
             
         Returns:
-            str: Path to saved image or None if failed
+            dict: Results of thumbnail extraction attempts
         """
-        try:
-            filename = f"{uuid.uuid4().hex}_{method_name}.jpg"
-            filepath = os.path.join(self.output_dir, filename)
+        return await asyncio.to_thread(self.process_url, url)
+    
+    def _mark_tested(self, method_name):
+        """Record that a method was tried."""
+        with self._lock:
+            self.results['methods_tested'].append(method_name)
+    
+    def _stream_html(self, url):
+        """Download the page HTML in one streamed request.
+        
+        The meta tags the extractors look for live in <head>, so the HTML up to
+        </head> is yielded as soon as it arrives, before the rest of the body.
+        
+        Args:
+            url: URL of the page
             
-            if isinstance(image_data, str) and (image_data.startswith('http://') or image_data.startswith('https://')):
-                # If image_data is a URL, download it
-                logger.info(f"Downloading image from {image_data}")
-                response = requests.get(image_data, headers=self.headers, timeout=10)
+        Yields:
+            bytes: The HTML up to and including </head>, then the full page
+        """
+        try:
+            with self.session.get(url, stream=True, timeout=10) as response:
                 response.raise_for_status()
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-            else:
-                # Assume it's binary data
-                with open(filepath, 'wb') as f:
-                    f.write(image_data)
+                buf = bytearray()
+                head_sent = False
+                for chunk in response.iter_content(16384):
+                    # Search only the new bytes (plus room for a tag split across chunks)
+                    search_from = max(len(buf) - 16, 0)
+                    buf.extend(chunk)
+                    if not head_sent:
+                        match = _HEAD_END_RE.search(buf, search_from)
+                        if match or len(buf) > MAX_HEAD_BYTES:
+                            head_sent = True
+                            yield bytes(buf[:match.end()] if match else buf)
+                if not head_sent:
+                    yield bytes(buf)
+                yield bytes(buf)
+        except Exception as e:
+            logger.error(f"Failed to fetch page HTML: {str(e)}")
+    
+    def _absolutize(self, page_url, img_url):
+        """Resolve an image URL found on a page (relative, root-relative or
+        protocol-relative) against the page URL."""
+        # Most image URLs are already absolute and need no parsing at all
+        if img_url.startswith(('http://', 'https://')):
+            return img_url
+        return urljoin(page_url, img_url)
+    
+    def _parse_html(self, html):
+        """Parse HTML bytes, preferring the C-based lxml parser.
+        
+        Args:
+            html: Raw HTML, or None
             
-            logger.info(f"Saved thumbnail to {filepath}")
+        Returns:
+            BeautifulSoup: Parsed HTML, or None if there was nothing to parse
+        """
+        if html is None:
+            return None
+        # Imported here so URLs handled by the platform extractors never load bs4
+        from bs4 import BeautifulSoup, FeatureNotFound
+        
+        # lxml detects the encoding from the raw bytes itself
+        try:
+            return BeautifulSoup(html, 'lxml')
+        except FeatureNotFound:
+            return BeautifulSoup(html, 'html.parser')
+    
+    def _parse_head(self, html):
+        """Parse the HTML the meta tag methods search, with selectolax if installed.
+        
+        Args:
+            html: Raw HTML, or None
             
-            # Add to results
+        Returns:
+            HTMLParser or BeautifulSoup: Parsed HTML, or None if there was nothing to parse
+        """
+        if html is not None and HAS_SELECTOLAX:
+            return HTMLParser(html)
+        return self._parse_html(html)
+    
+    def _add_thumbnail(self, method_name, filepath):
+        """Record a saved thumbnail in the results."""
+        with self._lock:
             self.results['generated_thumbnails'].append({
                 'method': method_name,
                 'path': filepath
@@ -166,6 +430,63 @@ class URLThumbnailTester:
             
             if method_name not in self.results['successful_methods']:
                 self.results['successful_methods'].append(method_name)
+    
+    def save_image_url(self, image_url, method_name):
+        """Download an image and save it to file.
+        
+        Args:
+            image_url: URL to image
+            method_name: Name of method that generated the thumbnail
+            
+        Returns:
+            str: Path to saved image or None if failed
+        """
+        filepath = os.path.join(self.output_dir, f"{uuid.uuid4().hex}_{method_name}.jpg")
+        try:
+            cached_path = self._image_cache.get(image_url)
+            if cached_path is not None:
+                # Another method already downloaded this image
+                shutil.copyfile(cached_path, filepath)
+            else:
+                logger.info(f"Downloading image from {image_url}")
+                # Stream the body straight to disk instead of materializing it in memory
+                with self.session.get(image_url, headers=IMAGE_HEADERS, timeout=10, stream=True) as response:
+                    response.raise_for_status()
+                    # Still decode if the server compressed the body anyway
+                    response.raw.decode_content = True
+                    with open(filepath, 'wb') as f:
+                        shutil.copyfileobj(response.raw, f, length=64 * 1024)
+                self._image_cache[image_url] = filepath
+        except Exception as e:
+            logger.error(f"Failed to save image: {str(e)}")
+            logger.error(traceback.format_exc())
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return None
+        
+        logger.info(f"Saved thumbnail to {filepath}")
+        self._add_thumbnail(method_name, filepath)
+        return filepath
+    
+    def save_image_bytes(self, data, method_name):
+        """Save already-downloaded image data to file.
+        
+        Args:
+            data: Raw image data
+            method_name: Name of method that generated the thumbnail
+            
+        Returns:
+            str: Path to saved image or None if failed
+        """
+        try:
+            filename = f"{uuid.uuid4().hex}_{method_name}.jpg"
+            filepath = os.path.join(self.output_dir, filename)
+            
+            with open(filepath, 'wb') as f:
+                f.write(data)
+            
+            logger.info(f"Saved thumbnail to {filepath}")
+            self._add_thumbnail(method_name, filepath)
             
             return filepath
         except Exception as e:
@@ -179,45 +500,37 @@ class URLThumbnailTester:
         Args:
             url: YouTube URL
         """
-        self.results['methods_tested'].append('youtube_api')
+        self._mark_tested('youtube_api')
         try:
-            # Extract video ID
-            video_id = None
+            # Extract video ID (youtu.be, watch?v=, embed and shorts URLs)
+            match = _YOUTUBE_ID_RE.search(url)
+            video_id = match.group(1) if match else None
             
-            # Pattern for youtu.be URLs
-            if 'youtu.be/' in url:
-                video_id = url.split('youtu.be/')[1].split('?')[0]
-            
-            # Pattern for youtube.com URLs
-            elif 'youtube.com/watch' in url:
-                query = urlparse(url).query
-                params = dict(param.split('=') for param in query.split('&') if '=' in param)
-                video_id = params.get('v')
-            
-            # Pattern for youtube.com/embed URLs
-            elif 'youtube.com/embed/' in url:
-                video_id = url.split('youtube.com/embed/')[1].split('?')[0]
-                
             if video_id:
-                # Try multiple thumbnail formats
+                # maxresdefault exists for most videos; for videos without it YouTube
+                # answers with a tiny placeholder, so hqdefault, which every video has,
+                # is requested at the same time and used as the fallback
                 thumbnail_urls = [
-                    f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg",  # HD
-                    f"https://img.youtube.com/vi/{video_id}/sddefault.jpg",      # SD
-                    f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg",      # HQ
-                    f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg",      # MQ
-                    f"https://img.youtube.com/vi/{video_id}/default.jpg"         # Default
+                    ('youtube_hd', 'HD', f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"),
+                    ('youtube_hq', 'HQ', f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg"),
                 ]
-                
-                for i, thumbnail_url in enumerate(thumbnail_urls):
-                    try:
-                        response = requests.head(thumbnail_url, timeout=5)
-                        if response.status_code == 200:
-                            quality = ['HD', 'SD', 'HQ', 'MQ', 'Default'][i]
+                with ThreadPoolExecutor(max_workers=len(thumbnail_urls)) as executor:
+                    futures = [
+                        executor.submit(self.session.get, thumbnail_url, timeout=5)
+                        for _, _, thumbnail_url in thumbnail_urls
+                    ]
+                    for (method_name, quality, thumbnail_url), future in zip(thumbnail_urls, futures):
+                        try:
+                            response = future.result()
+                        except Exception as e:
+                            logger.warning(f"Error fetching YouTube thumbnail {thumbnail_url}: {str(e)}")
+                            continue
+                        if response.status_code == 200 and len(response.content) > 1024:
                             logger.info(f"Found YouTube thumbnail ({quality}): {thumbnail_url}")
-                            self.save_image(thumbnail_url, f'youtube_{quality.lower()}')
+                            self.save_image_bytes(response.content, method_name)
                             break
-                    except Exception as e:
-                        logger.warning(f"Failed to get YouTube {['HD', 'SD', 'HQ', 'MQ', 'Default'][i]} thumbnail: {str(e)}")
+                    else:
+                        logger.warning("No YouTube thumbnail found")
             else:
                 logger.warning("Could not extract YouTube video ID from URL")
         except Exception as e:
@@ -230,28 +543,23 @@ class URLThumbnailTester:
         Args:
             url: Vimeo URL
         """
-        self.results['methods_tested'].append('vimeo_api')
+        self._mark_tested('vimeo_api')
         try:
-            # Extract video ID
-            video_id = None
-            if 'vimeo.com/' in url:
-                path_parts = urlparse(url).path.split('/')
-                for part in path_parts:
-                    if part.isdigit():
-                        video_id = part
-                        break
+            # Extract video ID (first all-digit path segment)
+            match = _VIMEO_ID_RE.search(url)
+            video_id = match.group(1) if match else None
             
             if video_id:
                 # Use Vimeo oEmbed API
                 oembed_url = f"https://vimeo.com/api/oembed.json?url=https://vimeo.com/{video_id}"
-                response = requests.get(oembed_url, headers=self.headers, timeout=10)
+                response = self.session.get(oembed_url, timeout=10)
                 
                 if response.status_code == 200:
                     data = response.json()
                     if 'thumbnail_url' in data:
                         thumbnail_url = data['thumbnail_url']
                         logger.info(f"Found Vimeo thumbnail: {thumbnail_url}")
-                        self.save_image(thumbnail_url, 'vimeo_api')
+                        self.save_image_url(thumbnail_url, 'vimeo_api')
                     else:
                         logger.warning("No thumbnail_url in Vimeo API response")
                 else:
@@ -268,24 +576,23 @@ class URLThumbnailTester:
         Args:
             url: Dailymotion URL
         """
-        self.results['methods_tested'].append('dailymotion_api')
+        self._mark_tested('dailymotion_api')
         try:
             # Extract video ID
-            video_id = None
-            if 'dailymotion.com/video/' in url:
-                video_id = url.split('dailymotion.com/video/')[1].split('?')[0]
+            match = _DAILYMOTION_ID_RE.search(url)
+            video_id = match.group(1) if match else None
             
             if video_id:
                 # Use Dailymotion oEmbed API
                 oembed_url = f"https://www.dailymotion.com/services/oembed?url=https://www.dailymotion.com/video/{video_id}&format=json"
-                response = requests.get(oembed_url, headers=self.headers, timeout=10)
+                response = self.session.get(oembed_url, timeout=10)
                 
                 if response.status_code == 200:
                     data = response.json()
                     if 'thumbnail_url' in data:
                         thumbnail_url = data['thumbnail_url']
                         logger.info(f"Found Dailymotion thumbnail: {thumbnail_url}")
-                        self.save_image(thumbnail_url, 'dailymotion_api')
+                        self.save_image_url(thumbnail_url, 'dailymotion_api')
                     else:
                         logger.warning("No thumbnail_url in Dailymotion API response")
                 else:
@@ -296,122 +603,80 @@ class URLThumbnailTester:
             logger.error(f"Error in Dailymotion thumbnail extraction: {str(e)}")
             logger.error(traceback.format_exc())
     
-    def try_opengraph_thumbnail(self, url):
+    def try_opengraph_thumbnail(self, url, head):
         """Try to extract OpenGraph thumbnail.
         
         Args:
             url: URL to process
+            head: Parsed page <head>, or None if the page could not be fetched
         """
-        self.results['methods_tested'].append('opengraph')
+        self._mark_tested('opengraph')
+        if head is None:
+            return
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Look for og:image meta tag
-            og_image = soup.find('meta', property='og:image')
-            if og_image and og_image.get('content'):
-                image_url = og_image['content']
+            image_url = _meta_content(head, 'meta[property="og:image"]')
+            if image_url:
                 # Make sure URL is absolute
-                if not image_url.startswith(('http://', 'https://')):
-                    base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
-                    if image_url.startswith('/'):
-                        image_url = f"{base_url}{image_url}"
-                    else:
-                        image_url = f"{base_url}/{image_url}"
+                image_url = self._absolutize(url, image_url)
                 
                 logger.info(f"Found OpenGraph image: {image_url}")
-                self.save_image(image_url, 'opengraph')
+                self.save_image_url(image_url, 'opengraph')
             else:
                 logger.warning("No OpenGraph image found")
         except Exception as e:
             logger.error(f"Error in OpenGraph thumbnail extraction: {str(e)}")
             logger.error(traceback.format_exc())
     
-    def try_twitter_card_thumbnail(self, url):
+    def try_twitter_card_thumbnail(self, url, head):
         """Try to extract Twitter Card thumbnail.
         
         Args:
             url: URL to process
+            head: Parsed page <head>, or None if the page could not be fetched
         """
-        self.results['methods_tested'].append('twitter_card')
+        self._mark_tested('twitter_card')
+        if head is None:
+            return
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Look for twitter:image meta tag
-            twitter_image = soup.find('meta', attrs={'name': 'twitter:image'}) or \
-                           soup.find('meta', attrs={'property': 'twitter:image'})
+            image_url = _meta_content(head, 'meta[name="twitter:image"], meta[property="twitter:image"]')
             
-            if twitter_image and twitter_image.get('content'):
-                image_url = twitter_image['content']
+            if image_url:
                 # Make sure URL is absolute
-                if not image_url.startswith(('http://', 'https://')):
-                    base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
-                    if image_url.startswith('/'):
-                        image_url = f"{base_url}{image_url}"
-                    else:
-                        image_url = f"{base_url}/{image_url}"
+                image_url = self._absolutize(url, image_url)
                 
                 logger.info(f"Found Twitter Card image: {image_url}")
-                self.save_image(image_url, 'twitter_card')
+                self.save_image_url(image_url, 'twitter_card')
             else:
                 logger.warning("No Twitter Card image found")
         except Exception as e:
             logger.error(f"Error in Twitter Card thumbnail extraction: {str(e)}")
             logger.error(traceback.format_exc())
     
-    def try_schema_org_thumbnail(self, url):
+    def try_schema_org_thumbnail(self, url, head):
         """Try to extract Schema.org thumbnail.
         
         Args:
             url: URL to process
+            head: Parsed page <head>, or None if the page could not be fetched
         """
-        self.results['methods_tested'].append('schema_org')
+        self._mark_tested('schema_org')
+        if head is None:
+            return
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Look for JSON-LD schema
-            schema_tags = soup.find_all('script', attrs={'type': 'application/ld+json'})
-            for tag in schema_tags:
+            for text in _script_texts(head, 'script[type="application/ld+json"]'):
                 try:
-                    data = json.loads(tag.string)
-                    # Look for image in schema
-                    image_url = None
-                    
-                    if isinstance(data, list):
-                        for item in data:
-                            if isinstance(item, dict) and 'image' in item:
-                                image_url = item['image']
-                                if isinstance(image_url, dict) and 'url' in image_url:
-                                    image_url = image_url['url']
-                                break
-                    elif isinstance(data, dict):
-                        if 'image' in data:
-                            image_url = data['image']
-                            if isinstance(image_url, dict) and 'url' in image_url:
-                                image_url = image_url['url']
-                    
+                    data = _json_loads(text or '{}')
+                    # Take the first image anywhere in the schema (@graph, nested ImageObjects, ...)
+                    image_url = next(_walk_images(data), None)
                     if image_url:
                         # Make sure URL is absolute
-                        if not isinstance(image_url, str):
-                            continue
-                            
-                        if not image_url.startswith(('http://', 'https://')):
-                            base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
-                            if image_url.startswith('/'):
-                                image_url = f"{base_url}{image_url}"
-                            else:
-                                image_url = f"{base_url}/{image_url}"
+                        image_url = self._absolutize(url, image_url)
                         
                         logger.info(f"Found Schema.org image: {image_url}")
-                        self.save_image(image_url, 'schema_org')
+                        self.save_image_url(image_url, 'schema_org')
                         break
                 except Exception as e:
                     logger.warning(f"Error parsing JSON-LD: {str(e)}")
@@ -421,86 +686,65 @@ class URLThumbnailTester:
             logger.error(f"Error in Schema.org thumbnail extraction: {str(e)}")
             logger.error(traceback.format_exc())
     
-    def try_largest_image(self, url):
+    def try_largest_image(self, url, soup):
         """Try to find the largest image on the page.
         
         Args:
             url: URL to process
+            soup: Parsed page HTML, or None if the page could not be fetched
         """
-        self.results['methods_tested'].append('largest_image')
+        self._mark_tested('largest_image')
+        if soup is None:
+            return
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
             images = soup.find_all('img')
             
             if not images:
                 logger.warning("No images found on the page")
                 return
             
-            base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
+            # One pass collects the largest image with dimensions, the first image with
+            # data-* size attributes and the first non-gif/svg image, in that order of preference
             largest_area = 0
-            largest_image_url = None
+            largest_src = None
+            data_src = None
+            fallback_src = None
             
-            # Find image with width and height attributes
             for img in images:
+                src = img.get('src')
                 width = img.get('width')
                 height = img.get('height')
                 
-                if width and height:
+                if src and width and height:
                     try:
                         width = int(width)
                         height = int(height)
+                    except ValueError:
+                        pass
+                    else:
                         area = width * height
-                        
                         if area > largest_area and width >= 100 and height >= 100:
                             largest_area = area
-                            src = img.get('src')
-                            if src:
-                                # Make sure URL is absolute
-                                if not src.startswith(('http://', 'https://')):
-                                    if src.startswith('/'):
-                                        src = f"{base_url}{src}"
-                                    else:
-                                        src = f"{base_url}/{src}"
-                                largest_image_url = src
-                    except ValueError:
-                        pass
-            
-            # If no images with dimensions found, look for data-* attributes
-            if not largest_image_url:
-                for img in images:
-                    for attr in img.attrs:
-                        if attr.startswith('data-') and ('width' in attr or 'height' in attr):
-                            src = img.get('src') or img.get('data-src')
-                            if src:
-                                # Make sure URL is absolute
-                                if not src.startswith(('http://', 'https://')):
-                                    if src.startswith('/'):
-                                        src = f"{base_url}{src}"
-                                    else:
-                                        src = f"{base_url}/{src}"
-                                largest_image_url = src
+                            largest_src = src
+                            # Big enough to be the page's main image, so stop looking
+                            if area > GOOD_ENOUGH_IMAGE_AREA:
                                 break
+                
+                if data_src is None and any(
+                    attr.startswith('data-') and ('width' in attr or 'height' in attr) for attr in img.attrs
+                ):
+                    data_src = src or img.get('data-src')
+                
+                if fallback_src is None and src and not src.endswith(('.gif', '.svg')):
+                    fallback_src = src
             
-            # If still no image, just take the first one with a src
-            if not largest_image_url:
-                for img in images:
-                    src = img.get('src')
-                    if src and not src.endswith(('.gif', '.svg')):
-                        # Make sure URL is absolute
-                        if not src.startswith(('http://', 'https://')):
-                            if src.startswith('/'):
-                                src = f"{base_url}{src}"
-                            else:
-                                src = f"{base_url}/{src}"
-                        largest_image_url = src
-                        break
+            largest_image_url = largest_src or data_src or fallback_src
             
             if largest_image_url:
+                # Make sure URL is absolute
+                largest_image_url = self._absolutize(url, largest_image_url)
                 logger.info(f"Found largest image: {largest_image_url}")
-                self.save_image(largest_image_url, 'largest_image')
+                self.save_image_url(largest_image_url, 'largest_image')
             else:
                 logger.warning("No suitable images found")
         except Exception as e:
@@ -513,7 +757,7 @@ class URLThumbnailTester:
         Args:
             url: URL to process
         """
-        self.results['methods_tested'].append('screenshot')
+        self._mark_tested('screenshot')
         logger.info("Screenshot method is only supported with additional dependencies (selenium)")
         logger.info("This method requires a GUI environment and is not implemented in this test")
     
@@ -547,6 +791,46 @@ class URLThumbnailTester:
         print("="*60 + "\n")
 
 
+def process_urls_file(urls_file, output_dir=None, use_cache=True, workers=32, first_match=False):
+    """Process every URL in a file concurrently over one shared session.
+    
+    Args:
+        urls_file: Text file with one URL per line (blank lines and # comments are skipped)
+        output_dir: Directory to save thumbnails
+        use_cache: Cache HTTP responses on disk (needs requests-cache)
+        workers: Number of URLs processed at once
+        first_match: Skip the generic page methods when the platform extractor succeeds
+    """
+    with open(urls_file, encoding='utf-8') as f:
+        urls = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    logger.info(f"Processing {len(urls)} URLs with {workers} workers")
+    
+    # One session for all testers, so URLs on the same host share pooled connections
+    output_dir = output_dir or DEFAULT_OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    with create_session(output_dir, use_cache) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                URLThumbnailTester(output_dir=output_dir, session=session, first_match=first_match).process_url, url
+            ): url
+            for url in urls
+        }
+        
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"Error processing {url}: {str(e)}")
+                results = None
+            
+            if results:
+                methods = ', '.join(results['successful_methods']) or 'none'
+                print(f"{url}: {len(results['generated_thumbnails'])} thumbnails (successful methods: {methods})")
+            else:
+                print(f"Failed to process URL: {url}")
+
+
 def main():
     """Main function to run the URL thumbnail tester."""
     parser = argparse.ArgumentParser(
@@ -554,18 +838,36 @@ def main():
     )
     parser.add_argument("url", nargs="?", help="URL to test (if not provided, will prompt for input)")
     parser.add_argument("-o", "--output-dir", help="Directory to save thumbnails")
+    parser.add_argument("--no-cache", action="store_true", help="Do not cache HTTP responses on disk")
+    parser.add_argument("--urls-file", help="File with one URL per line to process in batch")
+    parser.add_argument("--workers", type=int, default=32, help="URLs processed at once in batch mode")
+    parser.add_argument("--prewarm-dns", action="store_true",
+                        help="Resolve platform hosts at startup and cache DNS lookups")
+    parser.add_argument("--first-match", action="store_true",
+                        help="Stop after the platform extractor (YouTube, Vimeo, Dailymotion) finds a thumbnail")
     args = parser.parse_args()
     
+    if args.prewarm_dns:
+        prewarm_dns()
+    
+    if args.urls_file:
+        process_urls_file(args.urls_file, output_dir=args.output_dir,
+                          use_cache=not args.no_cache, workers=args.workers,
+                          first_match=args.first_match)
+        return
+    
     # Get URL from command line or prompt
     url = args.url
     if not url:
         url = input("Enter URL to test: ").strip()
     
     # Create thumbnail tester
-    tester = URLThumbnailTester(output_dir=args.output_dir)
+    tester = URLThumbnailTester(output_dir=args.output_dir, use_cache=not args.no_cache,
+                                first_match=args.first_match)
     
-    # Process URL
-    results = tester.process_url(url)
+    # Process URL (the session's connections are closed afterwards)
+    with tester.session:
+        results = tester.process_url(url)
     
     if results:
         # Print summary
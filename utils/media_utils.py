@@ -4,16 +4,70 @@
 """Media utilities for handling video files and thumbnails."""
 
 import os
-import uuid
 import logging
 import asyncio
-import traceback
+from concurrent.futures import ThreadPoolExecutor
 from telethon import types
 import cv2
 from config import config
 
+# PyAV seeks straight to a keyframe, which is much faster than OpenCV's frame-accurate seek
+try:
+    import av
+    HAS_AV = True
+except ImportError:
+    HAS_AV = False
+
+# libjpeg-turbo's SIMD encoder for the OpenCV path's thumbnails (needs the system library too)
+try:
+    from turbojpeg import TurboJPEG
+    _TURBOJPEG = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _TURBOJPEG = None
+
 logger = logging.getLogger(__name__)
 
+# Create the media directories once, so saving never fails on a missing directory
+# (cv2.imwrite would only report it after decoding the whole frame)
+os.makedirs(config.VIDEO_DIR, exist_ok=True)
+os.makedirs(config.THUMBNAIL_DIR, exist_ok=True)
+
+# Directory prefixes for building file paths without os.path.join on every call
+_VIDEO_DIR_PREFIX = os.path.join(config.VIDEO_DIR, '')
+_THUMBNAIL_DIR_PREFIX = os.path.join(config.THUMBNAIL_DIR, '')
+
+# Bounded pool for the CPU-bound decode/encode work, kept apart from the loop's default executor
+_THUMB_POOL = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='thumb')
+
+# Let FFmpeg decode on the GPU (VAAPI, NVDEC, ...) where the host has one
+_CAPTURE_PARAMS = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+
+# JPEG settings for OpenCV thumbnails (quality 85 matches the PyAV path)
+_JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 85, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+
+# Video formats that can be thumbnailed; anything else is rejected before downloading
+SUPPORTED_VIDEO_MIME_TYPES = frozenset({
+    'video/mp4',
+    'video/webm',
+    'video/quicktime',
+    'video/x-matroska',
+})
+
+# Schemes a URL may already start with
+_URL_PREFIXES = ('http://', 'https://')
+
+# Without a server thumbnail, a thumbnail is made from the first keyframe once this much
+# of the video is on disk (enough for the index and first keyframe of a faststart MP4)
+EARLY_THUMBNAIL_BYTES = 2 * 1024 * 1024
+
+# Abandoned thumbnail tasks waiting for cleanup (the loop only keeps weak references)
+_cleanup_tasks = set()
+
+
+class EmptyVideoError(ValueError):
+    """Raised when Telegram describes a video as having no picture."""
+
+
 async def save_video_file(client, message):
     """
     Save a video file received from user.
@@ -24,151 +78,392 @@ async def save_video_file(client, message):
         
     Returns:
         tuple: (file_path, thumbnail_path) or (None, None) on failure
+        
+    Raises:
+        EmptyVideoError: If the video has no picture (it is not downloaded)
     """
     try:
-        logger.info(f"Starting to save video file from message with ID: {message.id}")
-        logger.info(f"Message attributes: {dir(message)}")
+        logger.debug("Starting to save video file from message with ID: %s", message.id)
         
         # Generate unique filename
-        video_filename = f"{uuid.uuid4().hex}.mp4"
-        video_path = os.path.join(config.VIDEO_DIR, video_filename)
-        logger.info(f"Generated video path: {video_path}")
+        video_filename = f"{os.urandom(8).hex()}.mp4"
+        video_path = f"{_VIDEO_DIR_PREFIX}{video_filename}"
+        logger.debug("Generated video path: %s", video_path)
         
         # Check if we have a media document
         if hasattr(message, 'media') and hasattr(message.media, 'document'):
             document = message.media.document
-            logger.info(f"Document found, MIME type: {getattr(document, 'mime_type', 'unknown')}")
+            logger.debug("Document found, MIME type: %s", getattr(document, 'mime_type', 'unknown'))
             
-            if hasattr(document, 'mime_type') and document.mime_type.startswith('video/'):
-                logger.info("Valid video MIME type detected")
+            if getattr(document, 'mime_type', None) in SUPPORTED_VIDEO_MIME_TYPES:
+                logger.debug("Valid video MIME type detected")
+                
+                # Telegram describes the video up front; an empty one would only be
+                # found out after the whole download, when no frame can be read.
+                # The duration is whole seconds, so 0 just means a clip under a second
+                video_attr = _video_attribute(document)
+                if video_attr is not None and (video_attr.w <= 0 or video_attr.h <= 0):
+                    logger.error(
+                        "Video has no picture (dimensions: %sx%s), not downloading",
+                        video_attr.w, video_attr.h
+                    )
+                    raise EmptyVideoError("The video has no picture")
+                
                 try:
-                    # Download media
-                    logger.info(f"Starting download to {video_path}")
-                    downloaded_path = await client.download_media(message.media, video_path)
-                    logger.info(f"Downloaded to: {downloaded_path}")
+                    # Download media, together with Telegram's own thumbnail when the
+                    # document has one, so no frame has to be decoded locally
+                    logger.debug("Starting download to %s", video_path)
+                    server_thumb = _largest_thumb(document)
+                    if server_thumb is not None:
+                        logger.debug("Downloading server thumbnail (%sx%s)", server_thumb.w, server_thumb.h)
+                        downloaded_path, thumbnail_path = await asyncio.gather(
+                            client.download_media(message.media, video_path),
+                            _download_server_thumbnail(client, message, server_thumb, video_path),
+                            return_exceptions=True
+                        )
+                        if isinstance(downloaded_path, BaseException):
+                            # Don't leave the thumbnail or a partial video behind
+                            for path in (video_path, thumbnail_path):
+                                if isinstance(path, str):
+                                    _delete_file(path)
+                            raise downloaded_path
+                    else:
+                        downloaded_path, thumbnail_path = await _download_with_thumbnail(
+                            client, message, video_path
+                        )
+                    logger.debug("Downloaded to: %s", downloaded_path)
                     
                     if not downloaded_path or not os.path.exists(downloaded_path):
-                        logger.error(f"Download failed - file not found at {downloaded_path}")
+                        logger.error("Download failed - file not found at %s", downloaded_path)
+                        if thumbnail_path:
+                            _delete_file(thumbnail_path)
                         return None, None
                         
-                    # Generate thumbnail
-                    logger.info("Generating thumbnail")
-                    thumbnail_path = await generate_thumbnail(downloaded_path)
+                    # Generate thumbnail (if the early attempt on the partial file failed)
+                    if not thumbnail_path:
+                        logger.debug("Generating thumbnail")
+                        thumbnail_path = await generate_thumbnail(downloaded_path)
                     
-                    logger.info(f"Video successfully saved to {downloaded_path}, thumbnail: {thumbnail_path}")
+                    logger.info("Video successfully saved to %s, thumbnail: %s", downloaded_path, thumbnail_path)
                     return downloaded_path, thumbnail_path
                 except Exception as e:
-                    logger.error(f"Error during download: {str(e)}")
-                    logger.error(traceback.format_exc())
+                    logger.exception("Error during download: %s", e)
                     return None, None
             else:
-                logger.error(f"Invalid MIME type: {getattr(document, 'mime_type', 'unknown')}")
+                logger.error("Invalid MIME type: %s", getattr(document, 'mime_type', 'unknown'))
                 return None, None
         else:
             logger.error("Message does not contain media.document")
             return None, None
+    except EmptyVideoError:
+        raise
     except Exception as e:
-        logger.error(f"Error in save_video_file: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in save_video_file: %s", e)
         return None, None
 
 
-async def generate_thumbnail(video_path):
+def _video_attribute(document):
+    """Get a document's DocumentAttributeVideo, or None if it has none."""
+    for attr in getattr(document, 'attributes', None) or []:
+        if isinstance(attr, types.DocumentAttributeVideo):
+            return attr
+    return None
+
+
+def _thumbnail_path(video_path):
+    """Get the thumbnail path for a video file."""
+    return f"{_THUMBNAIL_DIR_PREFIX}{os.path.basename(video_path)}.jpg"
+
+
+def _largest_thumb(document):
+    """
+    Get the largest server-side thumbnail attached to a Telegram document.
+    
+    Stripped thumbnails are too small to use and are ignored.
+    
+    Returns:
+        PhotoSize or None if the document has no usable thumbnail
+    """
+    thumbs = [
+        thumb for thumb in (getattr(document, 'thumbs', None) or [])
+        if isinstance(thumb, (types.PhotoSize, types.PhotoSizeProgressive))
+    ]
+    return max(thumbs, key=lambda thumb: thumb.w * thumb.h, default=None)
+
+
+async def _download_server_thumbnail(client, message, thumb, video_path):
+    """
+    Download a document's server-side thumbnail.
+    
+    Returns:
+        str: Path to the thumbnail or None on failure
+    """
+    try:
+        return await client.download_media(message.media, _thumbnail_path(video_path), thumb=thumb)
+    except Exception as e:
+        logger.warning("Failed to download server thumbnail: %s", e)
+        return None
+
+
+async def _download_with_thumbnail(client, message, video_path):
+    """
+    Download a video, generating its thumbnail while the rest downloads.
+    
+    With PyAV, a thumbnail is made from the first keyframe of the partial file
+    once EARLY_THUMBNAIL_BYTES are on disk, so it is usually ready long before
+    the download finishes. It fails when the index of a non-faststart MP4 is
+    not there yet.
+    
+    Returns:
+        tuple: (video_path, thumbnail_path), thumbnail_path is None if the early attempt failed
+    """
+    thumbnail_task = None
+    written = 0
+    try:
+        with open(video_path, 'wb') as f:
+            async for chunk in client.iter_download(message.media):
+                f.write(chunk)
+                written += len(chunk)
+                if HAS_AV and thumbnail_task is None and written >= EARLY_THUMBNAIL_BYTES:
+                    f.flush()
+                    logger.debug("Starting thumbnail generation after %s bytes", written)
+                    thumbnail_task = asyncio.create_task(generate_thumbnail(video_path, first_keyframe=True))
+    except BaseException:
+        # Don't leave the partial video or its thumbnail behind. A thumbnail job already
+        # running in the pool can't be stopped, so whatever it writes is removed when it ends
+        if thumbnail_task is not None:
+            _cleanup_tasks.add(thumbnail_task)
+            thumbnail_task.add_done_callback(_discard_thumbnail)
+        _delete_partial_file(video_path)
+        _delete_partial_file(_thumbnail_path(video_path))
+        raise
+    
+    thumbnail_path = await thumbnail_task if thumbnail_task is not None else None
+    return video_path, thumbnail_path
+
+
+def _discard_thumbnail(task):
+    """Delete the thumbnail an abandoned generate_thumbnail task produced."""
+    _cleanup_tasks.discard(task)
+    if not task.cancelled() and task.exception() is None and task.result():
+        _delete_partial_file(task.result())
+
+
+def _delete_partial_file(path):
+    """Delete a leftover file, logging failures instead of raising them."""
+    try:
+        _delete_file(path)
+    except OSError as e:
+        logger.error("Failed to delete %s: %s", path, e)
+
+
+def _thumbnail_size(width, height):
+    """
+    Scale frame dimensions down to thumbnail size, keeping the aspect ratio.
+    
+    Returns:
+        tuple: (width, height)
+    """
+    max_dim = 320  # Telegram thumbnail size
+    
+    if height > width:
+        return int(max_dim * width / height), max_dim
+    return max_dim, int(max_dim * height / width)
+
+
+def _save_thumbnail_av(video_path, thumbnail_path, first_keyframe=False):
+    """
+    Decode the keyframe nearest the middle of the video and save it as a
+    thumbnail with PyAV.
+    
+    The frame is scaled by libswscale straight from the decoder's YUV output,
+    so the full-resolution frame is never converted to a numpy array.
+    
+    Args:
+        video_path: Path to the video file
+        thumbnail_path: Path to save the thumbnail to
+        first_keyframe: Use the first keyframe instead, for files still being downloaded
+        
+    Returns:
+        bool: True if the thumbnail was saved
+    """
+    logger.debug("Opening video with PyAV")
+    # Undecodable metadata tags must not push the video onto the slower OpenCV path
+    with av.open(video_path, metadata_errors='ignore') as container:
+        stream = container.streams.video[0]
+        
+        # A thumbnail doesn't need the exact middle frame, so seek to the keyframe
+        # before it and decode only that one
+        if first_keyframe:
+            # Only the start of the file may be on disk yet, so stay there and
+            # have the decoder skip everything but keyframes
+            stream.codec_context.skip_frame = 'NONKEY'
+        elif stream.duration:
+            target_ts = (stream.start_time or 0) + stream.duration // 2
+            container.seek(target_ts, any_frame=False, backward=True, stream=stream)
+        elif container.duration:
+            container.seek(container.duration // 2, any_frame=False, backward=True)
+        
+        for frame in container.decode(stream):
+            logger.debug("Decoded frame at %ss, dimensions: %sx%s", frame.time, frame.width, frame.height)
+            new_width, new_height = _thumbnail_size(frame.width, frame.height)
+            logger.debug("Resizing to: %sx%s", new_width, new_height)
+            scaled = frame.reformat(width=new_width, height=new_height, format='rgb24')
+            
+            logger.debug("Saving thumbnail to: %s", thumbnail_path)
+            scaled.to_image().save(thumbnail_path, 'JPEG', quality=85)
+            return True
+    
+    logger.error("PyAV decoded no frames")
+    return False
+
+
+def _read_middle_frame_cv2(video_path):
+    """
+    Read the middle frame of the video with OpenCV.
+    
+    Args:
+        video_path: Path to the video file
+        
+    Returns:
+        numpy.ndarray: BGR image, or None on failure
+    """
+    logger.debug("Opening video with OpenCV")
+    vidcap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, _CAPTURE_PARAMS)
+    try:
+        if not vidcap.isOpened():
+            logger.error("Failed to open video file with OpenCV")
+            return None
+        
+        # Get total frames
+        total_frames = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
+        logger.debug("Total frames: %s", total_frames)
+        
+        if total_frames == 0:
+            logger.error("Video has 0 frames")
+            return None
+        
+        # Only one frame is needed, so keep the internal buffer minimal
+        vidcap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
+        # Seek to the middle by time, which goes straight to a timestamp seek, rather
+        # than by frame number, which can decode forward counting frames
+        fps = vidcap.get(cv2.CAP_PROP_FPS)
+        if fps > 0:
+            middle_msec = total_frames / fps * 1000 / 2
+            logger.debug("Setting position to middle: %.0f ms", middle_msec)
+            vidcap.set(cv2.CAP_PROP_POS_MSEC, middle_msec)
+        else:
+            middle_frame = total_frames // 2
+            logger.debug("Setting position to middle frame: %s", middle_frame)
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame)
+        
+        # Read the frame
+        success = vidcap.grab()
+        if success:
+            success, image = vidcap.retrieve()
+        if not success:
+            logger.error("Failed to read middle frame")
+            return None
+        
+        logger.debug("Successfully read middle frame")
+        return image
+    finally:
+        vidcap.release()
+
+
+def _write_jpeg(path, image):
+    """
+    Encode a BGR image as a JPEG file, with libjpeg-turbo when available.
+    
+    Returns:
+        bool: True if the file was written
+    """
+    if _TURBOJPEG is not None:
+        data = _TURBOJPEG.encode(image, quality=85)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return True
+    return cv2.imwrite(path, image, _JPEG_PARAMS)
+
+
+async def generate_thumbnail(video_path, first_keyframe=False):
     """
     Generate thumbnail from video file.
     
     Args:
         video_path: Path to the video file
+        first_keyframe: Use the first keyframe instead of the middle of the video,
+            so a file that is still downloading can be used (needs PyAV)
         
     Returns:
         str: Path to the thumbnail or None on failure
     """
     try:
-        logger.info(f"Starting thumbnail generation for video: {video_path}")
+        logger.debug("Starting thumbnail generation for video: %s", video_path)
         
         if not os.path.exists(video_path):
-            logger.error(f"Video file doesn't exist at {video_path}")
+            logger.error("Video file doesn't exist at %s", video_path)
             return None
             
-        thumbnail_filename = f"{os.path.basename(video_path)}.jpg"
-        thumbnail_path = os.path.join(config.THUMBNAIL_DIR, thumbnail_filename)
-        logger.info(f"Target thumbnail path: {thumbnail_path}")
+        thumbnail_path = _thumbnail_path(video_path)
+        logger.debug("Target thumbnail path: %s", thumbnail_path)
         
-        # Use OpenCV to extract a frame from the middle of the video
+        # Extract a frame from the middle of the video
         def _generate():
             try:
-                logger.info("Opening video with OpenCV")
-                vidcap = cv2.VideoCapture(video_path)
-                
-                if not vidcap.isOpened():
-                    logger.error("Failed to open video file with OpenCV")
-                    return None
-                
-                # Get total frames
-                total_frames = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
-                logger.info(f"Total frames: {total_frames}")
+                if HAS_AV:
+                    try:
+                        if _save_thumbnail_av(video_path, thumbnail_path, first_keyframe):
+                            logger.debug("Thumbnail saved successfully")
+                            return thumbnail_path
+                    except Exception as e:
+                        logger.warning("PyAV could not read the video, falling back to OpenCV: %s", e)
                 
-                if total_frames == 0:
-                    logger.error("Video has 0 frames")
+                if first_keyframe:
+                    # OpenCV needs the whole file; the caller retries once it is complete
                     return None
                 
-                # Set position to the middle frame
-                middle_frame = total_frames // 2
-                logger.info(f"Setting position to middle frame: {middle_frame}")
-                vidcap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame)
-                
-                # Read the frame
-                success, image = vidcap.read()
-                if not success:
-                    logger.error("Failed to read middle frame")
+                image = _read_middle_frame_cv2(video_path)
+                if image is None:
                     return None
                 
-                logger.info("Successfully read middle frame")
-                    
                 # Resize image if needed (keeping aspect ratio)
                 height, width = image.shape[:2]
-                logger.info(f"Original image dimensions: {width}x{height}")
-                
-                max_dim = 320  # Telegram thumbnail size
-                
-                if height > width:
-                    new_height, new_width = max_dim, int(max_dim * width / height)
-                else:
-                    new_height, new_width = int(max_dim * height / width), max_dim
+                logger.debug("Original image dimensions: %sx%s", width, height)
                 
-                logger.info(f"Resizing to: {new_width}x{new_height}")
-                resized_image = cv2.resize(image, (new_width, new_height))
+                new_width, new_height = _thumbnail_size(width, height)
+                logger.debug("Resizing to: %sx%s", new_width, new_height)
+                # INTER_AREA is both faster and sharper than the default for large downscales
+                resized_image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
                 
                 # Save the thumbnail
-                logger.info(f"Saving thumbnail to: {thumbnail_path}")
-                result = cv2.imwrite(thumbnail_path, resized_image)
+                logger.debug("Saving thumbnail to: %s", thumbnail_path)
+                result = _write_jpeg(thumbnail_path, resized_image)
                 
                 if not result:
                     logger.error("Failed to save thumbnail image")
                     return None
                     
-                logger.info("Thumbnail saved successfully")
-                vidcap.release()
+                logger.debug("Thumbnail saved successfully")
                 return thumbnail_path
             except Exception as e:
-                logger.error(f"Error in _generate: {str(e)}")
-                logger.error(traceback.format_exc())
+                logger.exception("Error in _generate: %s", e)
                 return None
             
         # Run in a thread pool to avoid blocking
-        logger.info("Running thumbnail generation in a thread pool")
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, _generate)
+        logger.debug("Running thumbnail generation in a thread pool")
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_THUMB_POOL, _generate)
         
         if result:
-            logger.info(f"Thumbnail generated successfully at {result}")
+            logger.info("Thumbnail generated successfully at %s", result)
         else:
             logger.error("Thumbnail generation failed")
             
         return result
     except Exception as e:
-        logger.error(f"Error in generate_thumbnail: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in generate_thumbnail: %s", e)
         return None
 
 
@@ -182,28 +477,26 @@ def is_valid_url(url):
     Returns:
         bool: True if valid, False otherwise
     """
-    try:
-        # Add http:// if not present
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        # Accept almost any URL format - only basic check that it has some content
-        if len(url) < 5:  # Minimum possible URL would be like "h://x"
-            logger.warning(f"URL too short: {url}")
-            return False
-            
-        # Accept any domain and format
-        logger.info(f"URL validation for '{url}': True (all restrictions removed)")
-        return True
-    except Exception as e:
-        logger.error(f"Error validating URL: {str(e)}")
-        logger.error(traceback.format_exc())
+    if not isinstance(url, str):
+        return False
+    
+    # Add https:// if not present
+    if not url.startswith(_URL_PREFIXES):
+        url = 'https://' + url
+    
+    # Accept any domain and format - only basic check that it has some content
+    if len(url) < 5:  # Minimum possible URL would be like "h://x"
+        logger.debug("URL too short: %s", url)
         return False
+    
+    return True
 
 
-def delete_video_files(video):
+async def delete_video_files_async(video):
     """
-    Delete video and thumbnail files from disk.
+    Delete video and thumbnail files from disk without blocking the event loop.
+    
+    The files are unlinked concurrently in worker threads.
     
     Args:
         video: Video record from database
@@ -212,32 +505,30 @@ def delete_video_files(video):
         bool: True if successful, False otherwise
     """
     try:
-        logger.info(f"Attempting to delete video files for video ID: {video['id']}")
+        logger.info("Attempting to delete video files for video ID: %s", video['id'])
         
         # Only delete if it's a file type
         if video["type"] != "file":
             logger.info("Video is not a file type, no files to delete")
             return True
-            
-        # Delete video file if exists
-        video_path = video["path_or_url"]
-        if os.path.exists(video_path):
-            logger.info(f"Deleting video file: {video_path}")
-            os.remove(video_path)
-        else:
-            logger.warning(f"Video file not found at: {video_path}")
-            
-        # Delete thumbnail if exists
-        thumbnail_path = video["thumbnail_path"]
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            logger.info(f"Deleting thumbnail: {thumbnail_path}")
-            os.remove(thumbnail_path)
-        elif thumbnail_path:
-            logger.warning(f"Thumbnail not found at: {thumbnail_path}")
-            
+        
+        # Delete video file and thumbnail
+        await asyncio.gather(*(
+            asyncio.to_thread(_delete_file, path)
+            for path in (video["path_or_url"], video["thumbnail_path"]) if path
+        ))
+        
         logger.info("Video files deleted successfully")
         return True
     except Exception as e:
-        logger.error(f"Error deleting video files: {str(e)}")
-        logger.error(traceback.format_exc())
-        return False 
\ No newline at end of file
+        logger.exception("Error deleting video files: %s", e)
+        return False
+
+
+def _delete_file(path):
+    """Delete a file with a single unlink (no exists() check first)."""
+    try:
+        logger.info("Deleting file: %s", path)
+        os.unlink(path)
+    except FileNotFoundError:
+        logger.warning("File not found at: %s", path)